@@ -1,103 +1,523 @@
-# AI processing files 
-
-import streamlit as st
-import google.generativeai as genai
-# from dotenv import load_dotenv
-import os
-from PIL import Image
-import time
-import fitz  # PyMuPDF
-import re
-import base64
-import io
-from io import BytesIO
-import gc
-import fpdf  # Add this for PDF generation
-
-
-# Loading and Checking API calls
-# Load environment variables
-# load_dotenv()
-
-# Function to check if API key is set
-def is_api_key_set():
-    # api_key = os.getenv("API_KEY")
-    api_key = st.secrets["GEMINI_API_KEY"]
-    if not api_key:
-        api_key = st.session_state.get('api_key', '')
-    return bool(api_key)
-
-# API key input if not set in environment
-if not is_api_key_set():
-    st.markdown('<p class="sub-title">API Key Setup</p>', unsafe_allow_html=True)
-    api_key = st.text_input("Enter your Google Gemini API Key:", type="password")
-    if api_key:
-        st.session_state['api_key'] = api_key
-        os.environ["API_KEY"] = api_key
-        st.success("API Key set successfully!")
-    else:
-        st.warning("Please enter your Google Gemini API Key to continue.")
-        st.stop()
-
-# Configure the API
-try:
-    # GOOGLE_API_KEY = os.getenv("API_KEY") or st.session_state.get('api_key', '')
-    GOOGLE_API_KEY = st.secrets["GEMINI_API_KEY"] or st.session_state.get('api_key', '')
-    
-    genai.configure(api_key=GOOGLE_API_KEY)
-    model = genai.GenerativeModel('gemini-2.0-flash')
-except Exception as e:
-    st.error(f"Error initializing the API: {e}")
-    st.stop()
-
-# Function to create Hinglish conversion prompt
-def create_prompt():
-    return """
-    You are an expert Hinglish translator. You will receive images containing Hindi text, and your task is to accurately convert that text into Hinglish (Hindi written using the Roman alphabet). Pay close attention to context and ensure the transliteration is as natural and readable as possible.
-    
-    Here are a few examples of Hindi text and their Hinglish conversions:
-    **Examples:**
-    ***Image Text (Hindi):** नमस्ते
-        **Hinglish:** Namaste
-    ***Image Text (Hindi):** आप कैसे हैं?
-        **Hinglish:** Aap kaise hain?
-    ***Image Text (Hindi):** मेरा नाम...
-        **Hinglish:** Mera naam...
-    ***Image Text (Hindi):** यह एक उदाहरण है।
-        **Hinglish:** Yeh ek udaharan hai.
-    
-    Now, convert the text in the following image to Hinglish
-    NOTE - 
-    Do Not Add Words like - 
-    "Here's the Hinglish translation of the text from the image:" OR "Okay, here's the Hinglish translation of the text from the image:" in the text just the total converted text 
-    """
-
-# Function to clean AI-generated prefixes
-def clean_response(text):
-    # Patterns to remove
-    patterns = [
-        r"^Here\'s the Hinglish translation of the text from the image:\s*",
-        r"^Okay, here\'s the Hinglish translation of the text from the image:\s*",
-        r"^The Hinglish translation of the text is:\s*",
-        r"^Hinglish translation:\s*",
-        r"^Here\'s the translation:\s*",
-        r"^Translation:\s*"
-    ]
-    
-    for pattern in patterns:
-        text = re.sub(pattern, "", text, flags=re.IGNORECASE)
-    
-    return text.strip()
-    
-    
-# Function to process a single image
-def process_image(image):
-    with st.spinner("Converting image to Hinglish..."):
-        try:
-            prompt = create_prompt()
-            response = model.generate_content([prompt, image])
-            result = clean_response(response.text)
-            return result
-        except Exception as e:
-            st.error(f"Error processing image: {e}")
-            return None
+# AI processing files 
+# No Streamlit in here: these functions are shared by the web app, the CLI and background workers
+
+# Heavy libraries (google.generativeai, PyMuPDF, fpdf) are imported on first use, not here,
+# so the app starts fast and Streamlit reruns never pay for them again
+# from dotenv import load_dotenv
+import os
+import time
+import re
+import threading
+from functools import lru_cache
+
+from conversion_cache import get_conversion_cache, make_cache_key, make_text_cache_key
+from transliteration import transliterate
+from image_preparation import prepare_image
+from model_backends import GeminiBackend, DEFAULT_MODEL_NAME
+from client_pool import ClientPool, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE
+from model_routing import ModelRouter
+from resilience import (CircuitBreaker, RetryPolicy, call_with_retries, stream_with_retries, classify_error,
+                        RATE_LIMIT, RETRYABLE, SERVER_ERROR, TIMEOUT)
+
+
+# Model used for every conversion, also part of the conversion cache key
+MODEL_NAME = DEFAULT_MODEL_NAME
+
+# Engines that can convert text which is already digital: Gemini, or the local rule-based transliterator
+TEXT_BACKENDS = {
+    "gemini": "Gemini AI (best quality)",
+    "offline": "Offline transliteration (instant, no API calls)",
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+_gemini_backends = {}  # api key (or pool settings) -> backend, built once per process and shared by every session
+
+# Every model call is retried under this policy, and all workers share one circuit breaker
+_retry_policy = RetryPolicy()
+_circuit_breaker = CircuitBreaker()
+
+# Digital text has an instant offline fallback, so it does not wait out rate limits
+TEXT_RETRY_KINDS = (SERVER_ERROR, TIMEOUT)
+
+
+# Function to configure the Gemini API key, falls back to the GEMINI_API_KEY environment variable
+# (or to a key pool when GEMINI_API_KEYS is set, see configure_pool)
+# With a fast model (GEMINI_FAST_MODEL), simple pages go to it and dense pages to MODEL_NAME (see model_routing)
+# Calling it again with the same key (e.g. on every Streamlit rerun) reuses the existing client
+def configure_api(api_key=None, fast_model=None):
+    if not api_key and os.environ.get("GEMINI_API_KEYS"):
+        return configure_pool(fast_model=fast_model)
+    api_key = api_key or os.environ.get("GEMINI_API_KEY")
+    fast_model = fast_model or os.environ.get("GEMINI_FAST_MODEL")
+    if not api_key:
+        raise RuntimeError("No Gemini API key configured. Set GEMINI_API_KEY or pass an API key.")
+    with _backend_lock:
+        backend = _gemini_backends.get((api_key, fast_model))
+        if backend is None:
+            backend = GeminiBackend(api_key, MODEL_NAME, create_system_instruction())
+            if fast_model:
+                backend = ModelRouter(GeminiBackend(api_key, fast_model, create_system_instruction()), backend)
+            _gemini_backends[(api_key, fast_model)] = backend
+    set_backend(backend)
+
+
+# Function to spread requests over several API keys and models, each (key, model) pair with its own limits
+# Defaults come from GEMINI_API_KEYS and GEMINI_MODELS (comma separated), GEMINI_POOL_RPM and GEMINI_POOL_TPM
+def configure_pool(api_keys=None, model_names=None, requests_per_minute=None, tokens_per_minute=None, fast_model=None):
+    api_keys = api_keys or [key.strip() for key in os.environ.get("GEMINI_API_KEYS", "").split(",") if key.strip()]
+    model_names = model_names or [name.strip() for name in os.environ.get("GEMINI_MODELS", MODEL_NAME).split(",")
+                                  if name.strip()]
+    requests_per_minute = requests_per_minute or int(os.environ.get("GEMINI_POOL_RPM", DEFAULT_REQUESTS_PER_MINUTE))
+    tokens_per_minute = tokens_per_minute or int(os.environ.get("GEMINI_POOL_TPM", DEFAULT_TOKENS_PER_MINUTE))
+    fast_model = fast_model or os.environ.get("GEMINI_FAST_MODEL")
+    if not api_keys:
+        raise RuntimeError("No Gemini API keys configured for the pool. Set GEMINI_API_KEYS or pass keys.")
+    
+    settings = (tuple(api_keys), tuple(model_names), requests_per_minute, tokens_per_minute, fast_model)
+    with _backend_lock:
+        backend = _gemini_backends.get(settings)
+        if backend is None:
+            backend = ClientPool.from_keys(api_keys, model_names, requests_per_minute, tokens_per_minute,
+                                           create_system_instruction())
+            if fast_model:
+                # The fast model gets its own pool over the same keys, it has its own quota per key
+                fast_pool = ClientPool.from_keys(api_keys, [fast_model], requests_per_minute, tokens_per_minute,
+                                                 create_system_instruction())
+                backend = ModelRouter(fast_pool, backend)
+            _gemini_backends[settings] = backend
+    set_backend(backend)
+
+
+# Function to swap the model backend, e.g. for a StubBackend in load tests
+# Requests only carry a one-line instruction, so a Gemini backend needs create_system_instruction() as its
+# system instruction
+def set_backend(backend):
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+# Function to get the model backend, configuring Gemini from the environment on first use
+def get_backend():
+    if _backend is None:
+        configure_api()
+    return _backend
+
+
+# Function to get the requests per minute the configured backend can take (a key pool adds up its members)
+def get_requests_per_minute(default=DEFAULT_REQUESTS_PER_MINUTE):
+    return getattr(get_backend(), "requests_per_minute", default)
+
+
+# Function to change how model calls are retried (attempts, backoff, hedging)
+def set_retry_policy(policy):
+    global _retry_policy
+    _retry_policy = policy
+
+
+# Function to get the circuit breaker shared by all model calls
+def get_circuit_breaker():
+    return _circuit_breaker
+
+
+# Function to call the backend with retries, backoff and the shared circuit breaker
+# Retry counts, waiting times, model time and token counts are added to `stats`
+def _generate(backend, parts, stats=None, before_retry=None, retry_kinds=RETRYABLE):
+    started = time.perf_counter()
+    try:
+        return call_with_retries(lambda: backend.generate(parts, usage=stats), _retry_policy, _circuit_breaker,
+                                 stats, before_retry, retry_kinds)
+    finally:
+        if stats is not None:
+            stats["model_seconds"] = time.perf_counter() - started
+
+
+# Function to convert one page's parts with the backend, cleaned; a router picks the model from `content`
+def _generate_page(backend, parts, content, stats=None, before_retry=None, retry_kinds=RETRYABLE):
+    if isinstance(backend, ModelRouter):
+        return backend.convert(content, lambda model, call_stats: clean_response(
+            _generate(model, parts, call_stats, before_retry, retry_kinds)), stats, before_escalate=before_retry)
+    return clean_response(_generate(backend, parts, stats, before_retry, retry_kinds))
+
+
+# Function to create the system instruction: the fixed instructions and examples for every request
+# It is set on the model once per process (see GeminiBackend), so page requests only carry their input and a
+# one-line instruction instead of paying for and uploading the whole prompt each time
+@lru_cache(maxsize=None)
+def create_system_instruction():
+    return """
+    You are an expert Hinglish translator. You will receive images containing Hindi text, or Hindi text in Devanagari script, and your task is to accurately convert that text into Hinglish (Hindi written using the Roman alphabet). Pay close attention to context and ensure the transliteration is as natural and readable as possible.
+    
+    Here are a few examples of Hindi text and their Hinglish conversions:
+    **Examples:**
+    ***Text (Hindi):** नमस्ते
+        **Hinglish:** Namaste
+    ***Text (Hindi):** आप कैसे हैं?
+        **Hinglish:** Aap kaise hain?
+    ***Text (Hindi):** मेरा नाम...
+        **Hinglish:** Mera naam...
+    ***Text (Hindi):** यह एक उदाहरण है।
+        **Hinglish:** Yeh ek udaharan hai.
+    
+    NOTE - 
+    Do Not Add Words like - 
+    "Here's the Hinglish translation of the text from the image:" OR "Okay, here's the Hinglish translation of the text from the image:" in the output, just the total converted text 
+    """
+
+
+# Function to create the per-request instruction sent with an image (the system instruction has the rest)
+@lru_cache(maxsize=None)
+def create_prompt():
+    return "Convert the text in the following image to Hinglish."
+
+
+# Function to create the per-request instruction for Hindi text that is already digital (no image involved)
+@lru_cache(maxsize=None)
+def create_text_prompt():
+    return "Convert the following text to Hinglish. Keep the line breaks of the original text:"
+
+
+# Function to get the instructions a conversion cache key covers: the system instruction plus the request's own
+@lru_cache(maxsize=None)
+def cache_prompt(prompt):
+    return create_system_instruction() + prompt
+
+
+# AI-generated prefixes to remove
+PREFIX_PATTERNS = [
+    r"^Here\'s the Hinglish translation of the text from the image:\s*",
+    r"^Here\'s the Hinglish translation of the text:\s*",
+    r"^Okay, here\'s the Hinglish translation of the text from the image:\s*",
+    r"^The Hinglish translation of the text is:\s*",
+    r"^Hinglish translation:\s*",
+    r"^Here\'s the translation:\s*",
+    r"^Translation:\s*"
+]
+# A streamed response is held back until it is longer than any prefix, so a split prefix is still caught
+PREFIX_LOOKAHEAD_CHARS = 80
+
+
+# Function to remove AI-generated prefixes from the start of a response
+def strip_prefixes(text):
+    for pattern in PREFIX_PATTERNS:
+        text = re.sub(pattern, "", text, flags=re.IGNORECASE)
+    return text.lstrip()
+
+
+# Function to clean AI-generated prefixes
+def clean_response(text):
+    return strip_prefixes(text).strip()
+
+
+# Function to clean a streamed response: prefixes are removed from the opening text only,
+# everything after it is passed through untouched as it arrives
+def clean_stream(chunks):
+    chunks = iter(chunks)
+    head = ""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= PREFIX_LOOKAHEAD_CHARS:
+            break
+    head = strip_prefixes(head)
+    if head:
+        yield head
+    for chunk in chunks:
+        if chunk:
+            yield chunk
+    
+    
+# Function to convert a single image without touching the UI (safe to call from worker threads)
+# Pass a dict as `stats` to get the upload size and retry details back
+# `before_retry` is called before every retry, e.g. to take another rate limit token
+def convert_image(image, stats=None, before_retry=None):
+    prompt = create_prompt()
+    
+    # Same pixels + same prompt + same model always give the same conversion, so reuse it
+    backend = get_backend()
+    cache = get_conversion_cache()
+    cache_key = make_cache_key(image, cache_prompt(prompt), backend.model_name)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        if stats is not None:
+            stats["cached"] = True
+        return cached
+    
+    # Grayscale, trimmed, compressed payload instead of the full-colour page
+    started = time.perf_counter()
+    payload, preparation_stats = prepare_image(image)
+    if stats is not None:
+        stats.update(preparation_stats, prepare_seconds=time.perf_counter() - started)
+    
+    started = time.perf_counter()
+    result = _generate_page(backend, [prompt, payload], image, stats, before_retry)
+    if result:
+        cache.put(cache_key, result, latency=time.perf_counter() - started)
+    return result
+
+
+# Function to stream a conversion and store the finished text in the cache
+# `stats` gets the time to the first chunk, which is the wait the user actually sees
+def _stream_conversion(parts, cache, cache_key, stats=None, retry_kinds=RETRYABLE, content=None):
+    backend = get_backend()
+    if isinstance(backend, ModelRouter):
+        backend = backend.backend_for(content, stats)
+    started = time.perf_counter()
+    pieces = []
+    chunks = stream_with_retries(lambda: backend.generate_stream(parts, usage=stats), _retry_policy,
+                                 _circuit_breaker, stats, retry_kinds=retry_kinds)
+    for piece in clean_stream(chunks):
+        if not pieces and stats is not None:
+            stats["first_chunk_seconds"] = time.perf_counter() - started
+        pieces.append(piece)
+        yield piece
+    
+    result = "".join(pieces).strip()
+    if stats is not None:
+        stats["model_seconds"] = time.perf_counter() - started
+    if result:
+        cache.put(cache_key, result, latency=time.perf_counter() - started)
+
+
+# Function to convert a single image, yielding the Hinglish text in chunks as the model writes it
+# Joining the chunks gives the same text as convert_image (a cache hit arrives as a single chunk)
+def stream_image(image, stats=None):
+    prompt = create_prompt()
+    
+    backend = get_backend()
+    cache = get_conversion_cache()
+    cache_key = make_cache_key(image, cache_prompt(prompt), backend.model_name)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        if stats is not None:
+            stats["cached"] = True
+        yield cached
+        return
+    
+    started = time.perf_counter()
+    payload, preparation_stats = prepare_image(image)
+    if stats is not None:
+        stats.update(preparation_stats, prepare_seconds=time.perf_counter() - started)
+    yield from _stream_conversion([prompt, payload], cache, cache_key, stats, content=image)
+
+
+# Batching: several short pages share one request and one copy of the prompt
+MAX_BATCH_PAGES = 6
+MAX_BATCH_BYTES = 4 * 1024 * 1024  # well under the inline request size limit
+MAX_BATCH_INPUT_TOKENS = 8000
+IMAGE_TILE_SIZE = 768  # Gemini bills images per 768x768 tile
+TOKENS_PER_IMAGE_TILE = 258
+PAGE_DELIMITER = "=== PAGE {number} ==="
+PAGE_DELIMITER_PATTERN = re.compile(r"^\s*=+\s*PAGE\s+(\d+)\s*=+\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+# Function to create the prompt for a request carrying several page images
+@lru_cache(maxsize=None)
+def create_batch_prompt(page_count):
+    return f"""
+    You will receive {page_count} images, each one preceded by a marker like "{PAGE_DELIMITER.format(number=1)}".
+    Convert the text of every image to Hinglish separately. For each image, first write its marker on its own
+    line exactly as given, then the converted text of that image only. Keep the images in the order you received them.
+    """
+
+
+# Function to estimate the input tokens an image payload costs
+def estimate_image_tokens(width, height):
+    tiles = -(-width // IMAGE_TILE_SIZE) * -(-height // IMAGE_TILE_SIZE)
+    return max(1, tiles) * TOKENS_PER_IMAGE_TILE
+
+
+# Function to group prepared pages into batches that fit the byte and token budget, keeping page order
+def choose_batches(preparation_stats, max_pages=MAX_BATCH_PAGES, max_bytes=MAX_BATCH_BYTES,
+                   max_tokens=MAX_BATCH_INPUT_TOKENS):
+    batches = []
+    current = []
+    current_bytes = 0
+    current_tokens = 0
+    for index, stats in enumerate(preparation_stats):
+        page_tokens = estimate_image_tokens(stats["width"], stats["height"])
+        if current and (len(current) >= max_pages or current_bytes + stats["payload_bytes"] > max_bytes
+                        or current_tokens + page_tokens > max_tokens):
+            batches.append(current)
+            current, current_bytes, current_tokens = [], 0, 0
+        current.append(index)
+        current_bytes += stats["payload_bytes"]
+        current_tokens += page_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+# Function to split a batched response into per-page texts, returns {page position: text}
+def split_batch_response(text, page_count):
+    markers = list(PAGE_DELIMITER_PATTERN.finditer(text))
+    pages = {}
+    for position, marker in enumerate(markers):
+        number = int(marker.group(1))
+        end = markers[position + 1].start() if position + 1 < len(markers) else len(text)
+        page_text = clean_response(text[marker.end():end].strip())
+        # Ignore numbers we never sent and markers that appear twice
+        if 1 <= number <= page_count and number not in pages and page_text:
+            pages[number] = page_text
+    return pages
+
+
+# Function to convert several images with as few requests as possible (safe to call from worker threads)
+# `before_request` is called before every API request, e.g. to take a rate limit token
+# Returns one (result, stats) pair per image, pages the batch could not split are retried one at a time
+# With model routing every page is routed on its own, only pages routed to the same model share a request and
+# batched pages are not escalated to the strong model
+def convert_image_batch(images, before_request=None):
+    prompt = create_prompt()
+    backend = get_backend()
+    cache = get_conversion_cache()
+    outcomes = [(None, {}) for _ in images]
+    
+    pending = {}  # model -> [(position, cache key, payload, stats)]
+    for position, image in enumerate(images):
+        cache_key = make_cache_key(image, cache_prompt(prompt), backend.model_name)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            outcomes[position] = (cached, {"cached": True})
+            continue
+        payload, preparation_stats = prepare_image(image)
+        model = backend.backend_for(image, preparation_stats) if isinstance(backend, ModelRouter) else backend
+        pending.setdefault(model, []).append((position, cache_key, payload, preparation_stats))
+    
+    for model, model_pending in pending.items():
+        for batch in choose_batches([item[3] for item in model_pending]):
+            items = [model_pending[index] for index in batch]
+            retry = items
+            
+            if len(items) > 1:
+                if before_request:
+                    before_request()
+                parts = [create_batch_prompt(len(items))]
+                for number, (_, _, payload, _) in enumerate(items, start=1):
+                    parts.extend([PAGE_DELIMITER.format(number=number), payload])
+                
+                started = time.perf_counter()
+                call_stats = {}
+                response_text = _generate(model, parts, call_stats, before_request)
+                latency = time.perf_counter() - started
+                # Each page of the batch is billed its share of the request's tokens
+                for key in ("prompt_tokens", "response_tokens"):
+                    if key in call_stats:
+                        call_stats[key] = round(call_stats[key] / len(items))
+                page_texts = split_batch_response(response_text, len(items))
+                
+                retry = []
+                for number, item in enumerate(items, start=1):
+                    position, cache_key, _, preparation_stats = item
+                    if number in page_texts:
+                        cache.put(cache_key, page_texts[number], latency=latency / len(items))
+                        outcomes[position] = (page_texts[number],
+                                              dict(preparation_stats, batch_size=len(items), **call_stats))
+                    else:
+                        retry.append(item)
+            
+            # Single pages, and pages whose delimiters we could not find, go one request each
+            for position, cache_key, payload, preparation_stats in retry:
+                if before_request:
+                    before_request()
+                started = time.perf_counter()
+                call_stats = {}
+                result = clean_response(_generate(model, [prompt, payload], call_stats, before_request))
+                if result:
+                    cache.put(cache_key, result, latency=time.perf_counter() - started)
+                outcomes[position] = (result, dict(preparation_stats, batch_size=1, retried=len(items) > 1,
+                                                   **call_stats))
+    
+    return outcomes
+
+
+# Function to check whether an API error means we are out of quota / rate limited
+def is_rate_limit_error(error):
+    return classify_error(error) == RATE_LIMIT
+
+
+# Function to convert Hindi text (e.g. a PDF text layer) without an image upload
+# Falls back to offline transliteration when Gemini is rate limited or the circuit breaker is open
+def convert_text(text, text_backend="gemini", stats=None, before_retry=None):
+    if text_backend == "offline":
+        return transliterate_offline(text, stats)
+    if text_backend != "gemini":
+        raise ValueError(f"Unknown text backend: {text_backend}")
+    if _circuit_breaker.is_open():
+        return transliterate_offline(text, stats, fallback=CIRCUIT_OPEN_FALLBACK)
+    
+    try:
+        return convert_text_with_gemini(text, stats, before_retry)
+    except Exception as e:
+        if is_rate_limit_error(e):
+            return transliterate_offline(text, stats, fallback=RATE_LIMIT_FALLBACK)
+        raise
+
+
+# Why a Gemini page was transliterated offline instead (stats["offline_fallback"])
+CIRCUIT_OPEN_FALLBACK = "circuit_open"
+RATE_LIMIT_FALLBACK = "rate_limit"
+
+
+# Function to transliterate offline, noting it in the page stats so the output and metrics show it
+# `fallback` is set when Gemini was asked for and could not be used
+def transliterate_offline(text, stats=None, fallback=None):
+    if stats is not None:
+        stats["backend"] = "offline"
+        if fallback:
+            stats["offline_fallback"] = fallback
+    return transliterate(text)
+
+
+# Function to convert Hindi text, yielding the Hinglish text in chunks as it is produced
+# Offline conversion (and the rate limit fallback before any text arrived) comes as a single chunk
+def stream_text(text, text_backend="gemini", stats=None):
+    if text_backend == "offline":
+        yield transliterate_offline(text, stats)
+        return
+    if text_backend != "gemini":
+        raise ValueError(f"Unknown text backend: {text_backend}")
+    if _circuit_breaker.is_open():
+        yield transliterate_offline(text, stats, fallback=CIRCUIT_OPEN_FALLBACK)
+        return
+    
+    prompt = create_text_prompt()
+    backend = get_backend()
+    cache = get_conversion_cache()
+    cache_key = make_text_cache_key(text, cache_prompt(prompt), backend.model_name)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        if stats is not None:
+            stats["cached"] = True
+        yield cached
+        return
+    
+    streamed = False
+    try:
+        for piece in _stream_conversion([prompt, text], cache, cache_key, stats, TEXT_RETRY_KINDS, text):
+            streamed = True
+            yield piece
+    except Exception as e:
+        if streamed or not is_rate_limit_error(e):
+            raise
+        yield transliterate_offline(text, stats, fallback=RATE_LIMIT_FALLBACK)
+
+
+# Function to convert Hindi text with Gemini (server errors and timeouts are retried, rate limits are not)
+def convert_text_with_gemini(text, stats=None, before_retry=None):
+    prompt = create_text_prompt()
+    
+    backend = get_backend()
+    cache = get_conversion_cache()
+    cache_key = make_text_cache_key(text, cache_prompt(prompt), backend.model_name)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        if stats is not None:
+            stats["cached"] = True
+        return cached
+    
+    started = time.perf_counter()
+    result = _generate_page(backend, [prompt, text], text, stats, before_retry, TEXT_RETRY_KINDS)
+    if result:
+        cache.put(cache_key, result, latency=time.perf_counter() - started)
+    return result
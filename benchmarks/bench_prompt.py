@@ -0,0 +1,85 @@
+# Prompt overhead benchmark: input tokens, uploaded instruction bytes and latency per request for the
+# same page, sent with the whole prompt inline (how every request used to look) and with the fixed part
+# set once as the model's system instruction. The two modes take turns so network noise hits both alike.
+#
+# Usage:
+#   GEMINI_API_KEY=... python benchmarks/bench_prompt.py --requests 5
+#   GEMINI_API_KEY=... python benchmarks/bench_prompt.py --kind text --model gemini-2.0-flash-lite
+#   python benchmarks/bench_prompt.py --stub                 # offline, only checks the plumbing
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+SAMPLE_TEXT = "नमस्ते, आप कैसे हैं? सरकार ने आज नई योजना की घोषणा की। इसका लाभ सभी नागरिकों को मिलेगा।\n" * 8
+
+
+# Function to build the two backends: one without a system instruction, one with it
+def make_backends(args):
+    from ai_processing import create_system_instruction
+    from model_backends import GeminiBackend, StubBackend
+
+    if args.stub:
+        return (StubBackend(latency=("fixed", 0.05)),
+                StubBackend(latency=("fixed", 0.05), system_instruction=create_system_instruction()))
+    api_key = os.environ.get("GEMINI_API_KEY")
+    return (GeminiBackend(api_key, args.model),
+            GeminiBackend(api_key, args.model, create_system_instruction()))
+
+
+# Function to build the request parts of both modes for one page
+def make_parts(kind):
+    from ai_processing import create_prompt, create_system_instruction, create_text_prompt
+    from image_preparation import prepare_image
+    from run_benchmarks import make_scan_image
+
+    if kind == "text":
+        content, instruction = SAMPLE_TEXT, create_text_prompt()
+    else:
+        content, _ = prepare_image(make_scan_image(0))
+        instruction = create_prompt()
+    return [create_system_instruction() + instruction, content], [instruction, content]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-request prompt overhead with and without a system instruction.")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per mode")
+    parser.add_argument("--kind", choices=("image", "text"), default="image", help="Send a scanned page or digital text")
+    parser.add_argument("--model", default="gemini-2.0-flash", help="Gemini model to measure")
+    parser.add_argument("--stub", action="store_true", help="Use the stub model instead of Gemini")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    backends = dict(zip(("inline", "system_instruction"), make_backends(args)))
+    parts = dict(zip(("inline", "system_instruction"), make_parts(args.kind)))
+    samples = {mode: [] for mode in backends}
+    for _ in range(args.requests):
+        for mode, backend in backends.items():
+            usage = {}
+            started = time.perf_counter()
+            backend.generate(parts[mode], usage=usage)
+            samples[mode].append((time.perf_counter() - started, usage.get("prompt_tokens")))
+
+    results = {}
+    for mode, measured in samples.items():
+        tokens = [count for _, count in measured if count is not None]
+        results[mode] = {
+            "instruction_bytes": len(parts[mode][0].encode("utf-8")),
+            "median_prompt_tokens": statistics.median(tokens) if tokens else None,
+            "median_seconds": round(statistics.median(seconds for seconds, _ in measured), 3),
+        }
+        print(f"{mode:20} {json.dumps(results[mode])}", flush=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump({"kind": args.kind, "model": "stub" if args.stub else args.model, "results": results}, output,
+                      indent=2)
+
+
+if __name__ == "__main__":
+    main()
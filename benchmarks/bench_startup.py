@@ -0,0 +1,66 @@
+# Startup benchmark: how long a cold interpreter takes to import each entry module,
+# and which heavy libraries get dragged in by the import alone.
+#
+# Usage:
+#   python benchmarks/bench_startup.py                 # 5 cold imports per module, results printed as JSON
+#   python benchmarks/bench_startup.py --repeat 10 --output startup.json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ("ai_processing", "doc_file_processing", "job_service", "hinglish_cli")
+# Libraries that should only load once a conversion actually needs them
+HEAVY_MODULES = ("google.generativeai", "google.api_core", "fitz", "PIL.Image")
+
+CHILD_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+# Function to import one module in a fresh interpreter, returns the import time and the heavy modules loaded
+def time_cold_import(module):
+    script = CHILD_SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", script], cwd=REPO_ROOT, capture_output=True, text=True)
+    if output.returncode:
+        return {"error": output.stderr.strip().splitlines()[-1]}
+    return json.loads(output.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import time of the converter modules.")
+    parser.add_argument("--repeat", type=int, default=5, help="Cold imports per module (the median is reported)")
+    parser.add_argument("--only", nargs="+", choices=list(MODULES), help="Measure only these modules")
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for module in args.only or MODULES:
+        runs = [time_cold_import(module) for _ in range(args.repeat)]
+        errors = [run["error"] for run in runs if "error" in run]
+        if errors:
+            results[module] = {"error": errors[0]}
+        else:
+            results[module] = {
+                "median_seconds": round(statistics.median(run["seconds"] for run in runs), 4),
+                "heavy_modules_loaded": runs[0]["loaded"],
+            }
+        print(f"{module:22} {json.dumps(results[module])}", flush=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            json.dump(results, output, indent=2)
+    return 1 if any("error" in result for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
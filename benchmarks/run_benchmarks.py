@@ -0,0 +1,316 @@
+# Benchmarks for the conversion hot paths
+# Every benchmark runs in a fresh subprocess so its peak RSS is its own, then once more under tracemalloc for
+# its Python heap peak. Results are written as JSON and compared against a stored baseline so throughput or
+# memory regressions fail the run.
+#
+# Usage:
+#   python benchmarks/run_benchmarks.py                      # run and compare with benchmarks/baseline.json
+#   python benchmarks/run_benchmarks.py --save-baseline      # run and store the results as the new baseline
+#   python benchmarks/run_benchmarks.py --sizes 1 10 --only render clean_response
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from io import BytesIO
+from queue import Empty
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_SIZES = (1, 10, 100)
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+DEFAULT_TOLERANCE = 0.25  # 25% slower or bigger than the baseline counts as a regression
+DEFAULT_TIMEOUT = 600  # seconds a single benchmark run may take before it is killed
+PAGE_SIZE = (595, 842)  # A4 in points
+# Imported before measuring: importing PyMuPDF under tracemalloc takes seconds and would swamp small runs
+# (bench_startup.py measures import time on its own)
+PRELOAD_MODULES = ("fitz", "PIL.Image", "ai_processing", "doc_file_processing", "pdf_export")
+
+
+# Function to draw a fake scanned page: lines of dark word-shaped blocks with a headline bar, like Devanagari print
+def make_scan_image(seed, dpi=150):
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    width, height = round(PAGE_SIZE[0] * dpi / 72), round(PAGE_SIZE[1] * dpi / 72)
+    image = Image.new("L", (width, height), 250)
+    draw = ImageDraw.Draw(image)
+    line_height = round(dpi * 0.22)
+    margin = round(dpi * 0.8)
+    y = margin
+    while y < height - margin - line_height:
+        x = margin
+        while x < width - margin:
+            word = rng.randint(line_height, line_height * 4)
+            if x + word > width - margin:
+                break
+            draw.rectangle([x, y, x + word, y + 3], fill=20)  # shirorekha
+            draw.rectangle([x, y + 3, x + word, y + line_height * 0.7], fill=rng.randint(30, 90))
+            x += word + line_height // 2
+        y += round(line_height * 1.6)
+    return image
+
+
+# Function to build a synthetic Hindi PDF: scanned pages by default, real Devanagari text when a font is given
+def make_pdf(pages, font_path=None):
+    import fitz
+
+    doc = fitz.open()
+    for number in range(pages):
+        page = doc.new_page(width=PAGE_SIZE[0], height=PAGE_SIZE[1])
+        if font_path:
+            page.insert_font(fontname="hindi", fontfile=font_path)
+            text = "यह एक उदाहरण है। भारत सरकार ने आज नई योजना की घोषणा की।\n" * 30
+            page.insert_textbox(fitz.Rect(50, 50, 545, 792), text, fontname="hindi", fontsize=12)
+        else:
+            buffer = BytesIO()
+            make_scan_image(number).save(buffer, format="PNG")
+            page.insert_image(page.rect, stream=buffer.getvalue())
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
+
+
+# Function to build a response text that looks like a converted page
+def make_hinglish_page(seed, lines=40):
+    rng = random.Random(seed)
+    words = ["aaj", "sarkar", "ne", "nayi", "yojana", "ki", "ghoshna", "hai", "bharat", "log", "kaam", "din"]
+    return "\n".join(" ".join(rng.choice(words) for _ in range(12)) + "." for _ in range(lines))
+
+
+# Benchmarks: each takes the page count and the synthetic PDF's bytes, and returns the number of pages it processed
+# The PDF is built in the child before the clock starts, benchmarks outside PDF_BENCHMARKS get None
+
+def bench_render(pages, pdf_data):
+    from doc_file_processing import extract_images_from_pdf
+
+    image_list, total_pages = extract_images_from_pdf(pdf_data, max_pages=None)
+    for _, content in image_list:
+        if not isinstance(content, str):
+            content.load()
+            content.close()
+    return total_pages
+
+
+# Same pages rendered in this process only, to compare against the process pool used by bench_render
+def bench_render_serial(pages, pdf_data):
+    from doc_file_processing import open_pdf, iter_pdf_pages
+
+    doc, total_pages = open_pdf(pdf_data, max_pages=None)
+    for _, content in iter_pdf_pages(doc, total_pages, processes=1):
+        if not isinstance(content, str):
+            content.load()
+            content.close()
+    doc.close()
+    return total_pages
+
+
+def bench_png_roundtrip(pages, pdf_data):
+    import fitz
+    from PIL import Image
+
+    doc = fitz.open(stream=pdf_data, filetype="pdf")
+    for page in doc:
+        pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
+        image = Image.open(BytesIO(pix.tobytes("png")))
+        image.load()
+        image.close()
+    doc.close()
+    return pages
+
+
+def bench_clean_response(pages, pdf_data):
+    from ai_processing import clean_response
+
+    responses = ["Here's the Hinglish translation of the text from the image:\n" + make_hinglish_page(number)
+                 for number in range(pages)]
+    for response in responses * 20:
+        clean_response(response)
+    return pages * 20
+
+
+def bench_text_to_pdf(pages, pdf_data):
+    from doc_file_processing import text_to_pdf
+
+    text_to_pdf("\n\n".join(make_hinglish_page(number) for number in range(pages)))
+    return pages
+
+
+def bench_download_link(pages, pdf_data):
+    from doc_file_processing import get_download_link
+
+    get_download_link("\n\n".join(make_hinglish_page(number) for number in range(pages)))
+    return pages
+
+
+def bench_pdf_export(pages, pdf_data):
+    from pdf_export import write_pdf
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "export.pdf"), "wb") as output:
+            write_pdf("\n\n".join(make_hinglish_page(number) for number in range(pages)), output)
+    return pages
+
+
+def bench_process_pdf(pages, pdf_data):
+    from ai_processing import set_backend
+    from doc_file_processing import convert_pdf
+    from model_backends import StubBackend
+
+    # Model time is fixed and tiny so the pipeline itself is what gets measured
+    set_backend(StubBackend(latency=("fixed", 0.01)))
+    convert_pdf(pdf_data, max_pages=None, requests_per_minute=60000, max_workers=4)
+    return pages
+
+
+BENCHMARKS = {
+    "render": bench_render,
+    "render_serial": bench_render_serial,
+    "png_roundtrip": bench_png_roundtrip,
+    "clean_response": bench_clean_response,
+    "text_to_pdf": bench_text_to_pdf,
+    "download_link": bench_download_link,
+    "pdf_export": bench_pdf_export,
+    "process_pdf": bench_process_pdf,
+}
+# Benchmarks that read a synthetic PDF, it is generated in the child before timing starts
+PDF_BENCHMARKS = ("render", "render_serial", "png_roundtrip", "process_pdf")
+
+
+# Function run inside the benchmark subprocess
+# A timed run reports time and peak RSS, a traced run only the Python heap peak: tracemalloc slows every
+# allocation down, so it never runs while the clock is running
+def _run_in_child(name, pages, font_path, cache_dir, queue, trace_memory):
+    # A fresh, empty conversion cache so repeated runs never measure cache hits
+    os.environ["HINGLISH_CACHE_DIR"] = cache_dir
+    try:
+        for module in PRELOAD_MODULES:
+            importlib.import_module(module)
+        pdf_data = make_pdf(pages, font_path) if name in PDF_BENCHMARKS else None
+        if trace_memory:
+            tracemalloc.start()
+            BENCHMARKS[name](pages, pdf_data)
+            _, python_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            queue.put({"python_peak_mb": round(python_peak / (1024 * 1024), 1)})
+            return
+        started = time.perf_counter()
+        processed = BENCHMARKS[name](pages, pdf_data)
+        seconds = time.perf_counter() - started
+        # ru_maxrss is kilobytes on Linux, bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+        queue.put({
+            "seconds": round(seconds, 4),
+            "pages_per_second": round(processed / seconds, 2) if seconds else None,
+            "peak_rss_mb": round(peak_rss_mb, 1),
+        })
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+# Function to run one benchmark in a fresh subprocess and wait for its result
+# A child that dies without reporting (segfault, OOM kill) or runs past the timeout becomes an error result
+def _run_child(name, pages, font_path, trace_memory, timeout):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        process = context.Process(target=_run_in_child,
+                                  args=(name, pages, font_path, cache_dir, queue, trace_memory))
+        process.start()
+        deadline = time.monotonic() + timeout
+        result = None
+        while result is None:
+            try:
+                result = queue.get(timeout=1)
+            except Empty:
+                if process.exitcode is not None:
+                    result = {"error": f"benchmark process exited with code {process.exitcode}"}
+                elif time.monotonic() > deadline:
+                    process.kill()
+                    result = {"error": f"timed out after {timeout:g} seconds"}
+        process.join()
+    return result
+
+
+def run_benchmark(name, pages, font_path, timeout=DEFAULT_TIMEOUT):
+    result = _run_child(name, pages, font_path, False, timeout)
+    if "error" in result:
+        return result
+    memory = _run_child(name, pages, font_path, True, timeout)
+    return {**result, **memory}
+
+
+# Function to compare results with the baseline, returns a list of human readable regressions
+def compare_with_baseline(results, baseline, tolerance):
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get("results", {}).get(key)
+        if not previous or "error" in result or "error" in previous:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if previous.get(metric) and result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{key}: {metric} {previous[metric]} -> {result[metric]}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Hindi to Hinglish conversion pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Page counts to test")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--font", help="Devanagari TTF font, makes the synthetic PDFs text-layer PDFs instead of scans")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write this run's results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown/growth (0.25 = 25%%)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds before a benchmark run is killed")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        for pages in args.sizes:
+            key = f"{name}[{pages}]"
+            results[key] = run_benchmark(name, pages, args.font, args.timeout)
+            print(f"{key:28} {json.dumps(results[key])}", flush=True)
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "font": bool(args.font),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        regressions = compare_with_baseline(results, json.load(baseline_file), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
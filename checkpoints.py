@@ -0,0 +1,113 @@
+# Durable page checkpoints for long PDF conversions
+# Every finished page is written to SQLite as soon as it arrives, keyed by a hash of the document and the
+# conversion settings, so a crash, timeout or browser refresh resumes at the first missing page and no
+# page that was already paid for is sent to the API again.
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CHECKPOINT_DIR = os.environ.get("HINGLISH_CHECKPOINT_DIR", ".hinglish_checkpoints")
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600  # documents untouched for a week are dropped
+
+
+# Function to build the checkpoint key of a document: same bytes + same model + same text engine
+# `pdf` is the raw bytes or a SpooledUpload, which was hashed while it was written to disk
+def document_key(pdf, model_name, text_backend="gemini"):
+    digest = pdf.sha256 if hasattr(pdf, "sha256") else hashlib.sha256(pdf).hexdigest()
+    return f"{digest}:{model_name}:{text_backend}"
+
+
+class CheckpointStore:
+    """Converted pages of large documents, kept for a while after the last page was saved."""
+
+    def __init__(self, data_dir=DEFAULT_CHECKPOINT_DIR, ttl_seconds=DEFAULT_TTL_SECONDS):
+        os.makedirs(data_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(data_dir, "checkpoints.sqlite3"), check_same_thread=False)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                key TEXT PRIMARY KEY,
+                filename TEXT,
+                total_pages INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                key TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                stats TEXT,
+                PRIMARY KEY (key, page)
+            );
+            """
+        )
+        expired = time.time() - ttl_seconds
+        self.db.execute("DELETE FROM pages WHERE key IN (SELECT key FROM documents WHERE updated_at < ?)", (expired,))
+        self.db.execute("DELETE FROM documents WHERE updated_at < ?", (expired,))
+        self.db.commit()
+
+    # Function to register a document (again), keeping whatever pages it already has
+    def start(self, key, filename, total_pages):
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO documents (key, filename, total_pages, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET total_pages = excluded.total_pages, updated_at = excluded.updated_at",
+                (key, filename, total_pages, now, now),
+            )
+            self.db.commit()
+
+    # Only finished pages are stored (blank pages with an empty text), failed pages stay missing so the
+    # next run retries them
+    def save_page(self, key, record):
+        if record["text"] is None:
+            return
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO pages (key, page, text, stats) VALUES (?, ?, ?, ?)",
+                (key, record["page"], record["text"], json.dumps(record.get("stats", {}))),
+            )
+            self.db.execute("UPDATE documents SET updated_at = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+
+    # Function to get the finished pages of a document, returns {page number: text}
+    def completed_pages(self, key):
+        with self.lock:
+            rows = self.db.execute("SELECT page, text FROM pages WHERE key = ?", (key,)).fetchall()
+        return dict(rows)
+
+    # Function to drop a document and its pages
+    def forget(self, key):
+        with self.lock:
+            self.db.execute("DELETE FROM pages WHERE key = ?", (key,))
+            self.db.execute("DELETE FROM documents WHERE key = ?", (key,))
+            self.db.commit()
+
+    # Function to list unfinished documents, newest first
+    def unfinished(self):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT documents.key, filename, total_pages, COUNT(pages.page) FROM documents "
+                "LEFT JOIN pages ON pages.key = documents.key GROUP BY documents.key "
+                "HAVING COUNT(pages.page) < total_pages ORDER BY documents.updated_at DESC"
+            ).fetchall()
+        return [{"key": key, "filename": filename, "total_pages": total, "completed_pages": done}
+                for key, filename, total, done in rows]
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+# Function to get the process-wide checkpoint store shared across Streamlit sessions
+def get_checkpoint_store():
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = CheckpointStore()
+        return _shared_store
@@ -0,0 +1,214 @@
+# Pool of Gemini clients over several API keys and models
+# Every (key, model) pair has its own quota. The pool tracks each member's requests and input tokens over
+# the last minute, sends every request to the member with the most headroom, and takes throttled members
+# out of rotation until their retry delay has passed, so one exhausted key never stalls the others.
+
+import threading
+import time
+from collections import deque
+from io import BytesIO
+from itertools import chain
+
+from model_backends import GeminiBackend
+from rate_limiting import DEFAULT_REQUESTS_PER_MINUTE
+from resilience import classify_error, server_retry_delay, RATE_LIMIT
+
+WINDOW_SECONDS = 60.0
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+DEFAULT_THROTTLE_SECONDS = 60.0
+
+
+class PoolExhausted(Exception):
+    """Every member of the pool is throttled, looks like a 429 to the retry layer."""
+
+    code = 429
+
+    def __init__(self, retry_after):
+        super().__init__(f"429 All pooled API keys are rate limited, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+# Function to estimate the input tokens of a request from its parts, used for the tokens-per-minute limit
+def estimate_tokens(parts):
+    from ai_processing import estimate_image_tokens  # ai_processing builds the pool, import it late
+
+    tokens = 0
+    for part in parts:
+        if isinstance(part, str):
+            tokens += len(part) // 4 + 1
+        elif isinstance(part, dict):
+            from PIL import Image
+
+            with Image.open(BytesIO(part["data"])) as image:  # reads the header only
+                tokens += estimate_image_tokens(*image.size)
+        else:
+            tokens += estimate_image_tokens(part.width, part.height)
+    return tokens
+
+
+# Function to shorten an API key for display
+def mask_key(api_key):
+    return f"...{api_key[-4:]}" if api_key else "default"
+
+
+class PoolMember:
+    """One (API key, model) pair with its own limits, usage window and counters."""
+
+    def __init__(self, backend, label, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.backend = backend
+        self.label = label
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = deque()  # (timestamp, tokens) of requests in the last minute
+        self.window_tokens = 0
+        self.throttled_until = 0.0
+        self.stats = {"requests": 0, "tokens": 0, "throttles": 0, "errors": 0, "busy_seconds": 0.0}
+
+    def _expire(self, now):
+        while self.window and self.window[0][0] <= now - WINDOW_SECONDS:
+            self.window_tokens -= self.window.popleft()[1]
+
+    # Function to get the fraction of this member's quota still free, 0 when it cannot take the request
+    def headroom(self, now, tokens):
+        self._expire(now)
+        if now < self.throttled_until:
+            return 0.0
+        requests_left = 1 - (len(self.window) + 1) / self.requests_per_minute
+        tokens_left = 1 - (self.window_tokens + tokens) / self.tokens_per_minute
+        if requests_left < 0 or tokens_left < 0:
+            return 0.0
+        # +1e-9 keeps a member that can take exactly one more request above zero
+        return min(requests_left, tokens_left) + 1e-9
+
+    # Function to get the seconds until this member can take a request again
+    def seconds_until_free(self, now):
+        if now < self.throttled_until:
+            return self.throttled_until - now
+        return self.window[0][0] + WINDOW_SECONDS - now if self.window else 0.0
+
+    def record(self, now, tokens):
+        self.window.append((now, tokens))
+        self.window_tokens += tokens
+        self.stats["requests"] += 1
+        self.stats["tokens"] += tokens
+
+
+class ClientPool:
+    """Model backend that load balances requests over several API keys and models."""
+
+    def __init__(self, members, model_name=None):
+        if not members:
+            raise ValueError("A client pool needs at least one member")
+        self.members = members
+        models = sorted({member.backend.model_name for member in members})
+        # Part of the conversion cache key: one model keeps its name, a mix of models is its own "model"
+        self.model_name = model_name or (models[0] if len(models) == 1 else "pool:" + ",".join(models))
+        self.requests_per_minute = sum(member.requests_per_minute for member in members)
+        # The system instruction is billed with every request, so it counts towards the tokens per minute
+        self.instruction_tokens = max(len(getattr(member.backend, "system_instruction", None) or "") // 4
+                                      for member in members)
+        self.condition = threading.Condition()
+        self.started = time.monotonic()
+
+    @classmethod
+    def from_keys(cls, api_keys, model_names, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                  tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, system_instruction=None):
+        members = [
+            PoolMember(GeminiBackend(api_key, model_name, system_instruction), f"{mask_key(api_key)} {model_name}",
+                       requests_per_minute, tokens_per_minute)
+            for api_key in api_keys
+            for model_name in model_names
+        ]
+        return cls(members)
+
+    # Function to reserve a slot on the member with the most headroom, waiting while every member is busy
+    # Raises PoolExhausted when every member is throttled, so the circuit breaker takes over, and
+    # ValueError for a request larger than any member's tokens per minute, which would never get a slot
+    def _acquire(self, tokens, exclude=()):
+        fitting = [member for member in self.members if tokens <= member.tokens_per_minute]
+        if not fitting:
+            raise ValueError(f"A request of about {tokens} input tokens is larger than the tokens per minute "
+                             f"limit of every pooled API key")
+        candidates = [member for member in fitting if member not in exclude] or fitting
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if all(now < member.throttled_until for member in candidates):
+                    raise PoolExhausted(min(member.throttled_until for member in candidates) - now)
+                best = max(candidates, key=lambda member: member.headroom(now, tokens))
+                if best.headroom(now, tokens) > 0:
+                    best.record(now, tokens)
+                    return best
+                wait = min(member.seconds_until_free(now) for member in candidates)
+                self.condition.wait(timeout=max(wait, 0.01))
+
+    # Function to take a member out of rotation after a 429, for as long as the server asked
+    def _throttle(self, member, error):
+        with self.condition:
+            member.throttled_until = time.monotonic() + (server_retry_delay(error) or DEFAULT_THROTTLE_SECONDS)
+            member.stats["throttles"] += 1
+            self.condition.notify_all()
+
+    # Function to run a request, moving on to the next member when one is rate limited
+    def _run(self, parts, call):
+        tokens = estimate_tokens(parts) + self.instruction_tokens
+        tried = []
+        while True:
+            member = self._acquire(tokens, exclude=tried)
+            started = time.perf_counter()
+            try:
+                return call(member)
+            except Exception as e:
+                if classify_error(e) != RATE_LIMIT:
+                    with self.condition:
+                        member.stats["errors"] += 1
+                    raise
+                self._throttle(member, e)
+                tried.append(member)
+                if len(tried) == len(self.members):
+                    raise
+            finally:
+                with self.condition:
+                    member.stats["busy_seconds"] += time.perf_counter() - started
+
+    def generate(self, parts, usage=None):
+        return self._run(parts, lambda member: member.backend.generate(parts, usage))
+
+    # Streams are only moved to another member when the 429 arrives before the first chunk
+    def generate_stream(self, parts, usage=None):
+        return self._run(parts, lambda member: _first_chunk_checked(member.backend.generate_stream(parts, usage=usage)))
+
+    def get_stats(self):
+        with self.condition:
+            now = time.monotonic()
+            elapsed_minutes = max((now - self.started) / 60, 1e-9)
+            members = []
+            for member in self.members:
+                member._expire(now)
+                members.append(dict(
+                    member.stats,
+                    label=member.label,
+                    last_minute_requests=len(member.window),
+                    last_minute_tokens=member.window_tokens,
+                    requests_per_minute=member.stats["requests"] / elapsed_minutes,
+                    throttled=now < member.throttled_until,
+                ))
+        total = sum(member["requests"] for member in members)
+        return {
+            "members": members,
+            "requests": total,
+            "tokens": sum(member["tokens"] for member in members),
+            "requests_per_minute": total / elapsed_minutes,
+            "capacity_per_minute": self.requests_per_minute,
+        }
+
+
+# Function to pull the first chunk of a stream eagerly, so a rate limit error surfaces inside the pool
+def _first_chunk_checked(stream):
+    stream = iter(stream)
+    try:
+        first = next(stream)
+    except StopIteration:
+        return iter(())
+    return chain([first], stream)
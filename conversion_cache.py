@@ -0,0 +1,177 @@
+# Content-addressed cache for Hinglish conversions
+# Two tiers: an in-memory LRU for the hot entries and a SQLite store on disk that survives restarts.
+# One instance is shared by every Streamlit session running in the same process.
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+DEFAULT_CACHE_DIR = os.environ.get("HINGLISH_CACHE_DIR", ".hinglish_cache")
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_DISK_BYTES = 64 * 1024 * 1024  # 64 MB of converted text
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60  # 30 days
+
+
+# Function to build the cache key for an image conversion
+def make_cache_key(image, prompt, model_name):
+    """Hash of the raw pixels, mode and size plus the prompt and model that produced the text."""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    digest.update(b"\0")
+    # Hash the pixels as they are; the mode and size keep an L page apart from an RGB one with the same bytes
+    digest.update(f"{image.mode}:{image.width}x{image.height}".encode("ascii"))
+    digest.update(b"\0")
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+# Function to build the cache key for a text-only conversion (text-layer PDF pages)
+def make_text_cache_key(text, prompt, model_name):
+    digest = hashlib.sha256()
+    for part in (model_name, prompt, text):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, memory_entries=DEFAULT_MEMORY_ENTRIES,
+                 disk_bytes=DEFAULT_DISK_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.memory_entries = memory_entries
+        self.disk_bytes = disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.memory = OrderedDict()  # key -> (text, latency_seconds, created_at)
+        self.lock = threading.Lock()
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "saved_seconds": 0.0,
+        }
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, "conversions.sqlite3"), check_same_thread=False)
+        self.db.execute(
+            """CREATE TABLE IF NOT EXISTS conversions (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                latency REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS conversions_last_access ON conversions (last_access)")
+        self.db.commit()
+
+    def _expired(self, created_at, now):
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key, text, latency, created_at):
+        self.memory[key] = (text, latency, created_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    # Look up a conversion, returns the cached text or None
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and not self._expired(entry[2], now):
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                self.stats["saved_seconds"] += entry[1]
+                return entry[0]
+            if entry is not None:
+                del self.memory[key]
+
+            row = self.db.execute(
+                "SELECT text, latency, created_at FROM conversions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[2], now):
+                self.stats["misses"] += 1
+                return None
+
+            text, latency, created_at = row
+            self.db.execute("UPDATE conversions SET last_access = ? WHERE key = ?", (now, key))
+            self.db.commit()
+            self._remember(key, text, latency, created_at)
+            self.stats["disk_hits"] += 1
+            self.stats["saved_seconds"] += latency
+            return text
+
+    # Store a conversion together with how long the API call took
+    def put(self, key, text, latency=0.0):
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        with self.lock:
+            self._remember(key, text, latency, now)
+            self.db.execute(
+                "INSERT OR REPLACE INTO conversions (key, text, size, latency, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, text, size, latency, now, now),
+            )
+            self.stats["stores"] += 1
+            self._evict(now)
+            self.db.commit()
+
+    # Drop expired rows, then the least recently used rows until the disk tier fits the byte budget
+    def _evict(self, now):
+        if self.ttl_seconds is not None:
+            cursor = self.db.execute("DELETE FROM conversions WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.stats["evictions"] += cursor.rowcount
+
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM conversions").fetchone()[0]
+        if total <= self.disk_bytes:
+            return
+        for key, size in self.db.execute(
+            "SELECT key, size FROM conversions ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.disk_bytes:
+                break
+            self.db.execute("DELETE FROM conversions WHERE key = ?", (key,))
+            self.memory.pop(key, None)
+            total -= size
+            self.stats["evictions"] += 1
+
+    # Snapshot of the hit/miss counters plus the current size of both tiers
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            entries, size = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM conversions"
+            ).fetchone()
+            stats["memory_entries"] = len(self.memory)
+            stats["disk_entries"] = entries
+            stats["disk_bytes"] = size
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.db.execute("DELETE FROM conversions")
+            self.db.commit()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+# Function to get the process-wide cache shared across Streamlit sessions
+def get_conversion_cache():
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ConversionCache()
+        return _shared_cache
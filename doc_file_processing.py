@@ -1,134 +1,407 @@
-# Document Image Processing Functions
-
-import streamlit as st
-import google.generativeai as genai
-# from dotenv import load_dotenv
-import os
-from PIL import Image
-import time
-import fitz  # PyMuPDF
-import re
-import base64
-import io
-from io import BytesIO
-import gc
-import fpdf  # Add this for PDF generation
-
-
-# Importing from ai_processing.py 
-from ai_processing import  clean_response, process_image
-
-# Function to create a PDF from text
-def text_to_pdf(text):
-    pdf = fpdf.FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
-    
-    # Split text by lines and add to PDF
-    lines = text.split('\n')
-    for line in lines:
-        # Encode special characters
-        encoded_line = line.encode('latin-1', 'replace').decode('latin-1')
-        pdf.multi_cell(0, 10, encoded_line)
-        
-    # Return PDF as bytes
-    return BytesIO(pdf.output(dest='S').encode('latin-1'))
-    
-    
-    
-# Function to extract images from PDF using BytesIO instead of temp files
-def extract_images_from_pdf(pdf_file):
-    image_list = []
-    
-    try:
-        # Read PDF file as bytes
-        pdf_bytes = pdf_file.read()
-        
-        # Create a BytesIO object to avoid saving to disk
-        pdf_stream = BytesIO(pdf_bytes)
-        
-        # Open the PDF with PyMuPDF using the BytesIO stream
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        total_pages = len(doc)
-        
-        # Check page limit
-        if total_pages > 10:
-            st.warning(f"PDF has {total_pages} pages. Only the first 10 pages will be processed due to the page limit.")
-            total_pages = 10
-        
-        # Create progress bar
-        progress_bar = st.progress(0)
-        
-        for page_num in range(total_pages):
-            page = doc.load_page(page_num)
-            pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-            
-            # Convert pixmap to PIL Image directly using BytesIO
-            img_bytes = pix.tobytes("png")
-            img_stream = BytesIO(img_bytes)
-            img = Image.open(img_stream)
-            
-            # Store PIL image in the list
-            image_list.append((page_num + 1, img))
-            
-            # Update progress
-            progress_bar.progress((page_num + 1) / total_pages)
-        
-        progress_bar.empty()
-        return image_list, total_pages
-    except Exception as e:
-        st.error(f"Error extracting images from PDF: {e}")
-        return [], 0
-    finally:
-        # Force garbage collection
-        gc.collect()
-
-# Function to process PDF
-def process_pdf(pdf_file, delay_seconds):
-    try:
-        st.info("Extracting pages from PDF...")
-        image_list, total_pages = extract_images_from_pdf(pdf_file)
-        
-        if not image_list:
-            st.error("No pages could be extracted from the PDF.")
-            return None
-        
-        combined_text = ""
-        
-        with st.expander("Processing Details", expanded=True):
-            for page_num, image in image_list:
-                st.markdown(f"**Processing page {page_num}/{total_pages}**")
-                
-                try:
-                    # Process the image
-                    result = process_image(image)
-                    
-                    if result:
-                        combined_text += result + "\n\n"
-                        st.success(f"Page {page_num} processed successfully")
-                    else:
-                        st.error(f"Failed to process page {page_num}")
-                except Exception as e:
-                    st.error(f"Error processing page {page_num}: {e}")
-                
-                # Add delay between API calls to avoid rate limiting
-                if page_num < total_pages:  # Don't delay after the last page
-                    st.info(f"Waiting {delay_seconds} seconds before processing next page...")
-                    time_placeholder = st.empty()
-                    for remaining in range(delay_seconds, 0, -1):
-                        time_placeholder.info(f"Waiting {remaining} seconds...")
-                        time.sleep(1)
-                    time_placeholder.empty()
-        
-        return combined_text.strip()
-    finally:
-        # Force garbage collection to release memory
-        gc.collect()
-
-# Function to create a download link for text as PDF
-def get_download_link(text, filename="hinglish_translation.pdf", link_text="Download Hinglish Text as PDF/ Hinglish Text Download Kare"):
-    """Generates a link to download the text as a PDF file"""
-    pdf_bytes = text_to_pdf(text)
-    b64 = base64.b64encode(pdf_bytes.getvalue()).decode()
-    href = f'<a href="data:application/pdf;base64,{b64}" download="{filename}">{link_text}</a>'
-    return href
+# Document Image Processing Functions
+# No Streamlit in here: these functions are shared by the web app, the CLI and background workers
+
+# PyMuPDF and PIL are imported inside the functions that need them to keep startup fast
+# from dotenv import load_dotenv
+import os
+import time
+import base64
+from io import BytesIO
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+
+# Importing from ai_processing.py 
+from ai_processing import  clean_response, convert_image, convert_text, convert_image_batch, MAX_BATCH_PAGES
+from rate_limiting import TokenBucket, get_page_memory_budget, DEFAULT_REQUESTS_PER_MINUTE
+from image_preparation import choose_render_dpi
+from pdf_export import render_pdf
+from page_screening import PageScreener, BLANK, DUPLICATE
+from rasterization import (document_source, render_pages_parallel, render_process_slots, PARALLEL_MIN_PAGES,
+                           RENDER_PROCESSES)
+from metrics import record_document, record_page
+from text_documents import chunk_text, MAX_CHUNK_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Function to create a PDF from text (Unicode font, see pdf_export)
+def text_to_pdf(text):
+    return BytesIO(render_pdf(text))
+    
+    
+    
+# Minimum amount of Devanagari a text layer needs before we trust it over rendering the page
+MIN_DEVANAGARI_CHARS = 20
+MIN_DEVANAGARI_RATIO = 0.6
+
+
+# Function to check whether a page's text layer holds usable Devanagari text
+def has_devanagari_text(text):
+    # U+FFFD means the PDF fonts could not be mapped back to Unicode
+    if not text or "\ufffd" in text:
+        return False
+    
+    letters = 0
+    devanagari = 0
+    for char in text:
+        if char.isalpha() or "\u0900" <= char <= "\u097F":
+            letters += 1
+            if "\u0900" <= char <= "\u097F":
+                devanagari += 1
+    
+    # Legacy (non-Unicode) Hindi fonts extract as Latin gibberish, so they fail the ratio check
+    return devanagari >= MIN_DEVANAGARI_CHARS and devanagari / letters >= MIN_DEVANAGARI_RATIO
+
+
+# Default number of pages converted per PDF
+PAGE_LIMIT = 10
+
+
+# Function to open a PDF (uploaded file object, SpooledUpload, raw bytes or a path) with PyMuPDF
+# Returns the document and the number of pages to process
+def open_pdf(pdf_file, max_pages=PAGE_LIMIT):
+    import fitz  # PyMuPDF
+    
+    pdf_file = getattr(pdf_file, "source", pdf_file)  # a spooled upload opens from its file when it has one
+    if isinstance(pdf_file, (str, os.PathLike)):
+        # PyMuPDF reads the pages it needs from disk, the file is never loaded as a whole
+        doc = fitz.open(pdf_file)
+    else:
+        # getvalue() hands over the buffer of an in-memory upload without copying it
+        pdf_bytes = pdf_file if isinstance(pdf_file, bytes) else getattr(pdf_file, "getvalue", pdf_file.read)()
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    total_pages = len(doc)
+    
+    # Check page limit
+    if max_pages is not None and total_pages > max_pages:
+        logger.warning("PDF has %d pages, only the first %d will be processed", total_pages, max_pages)
+        total_pages = max_pages
+    
+    return doc, total_pages
+
+
+# Function to get the content of one page (0-based number): its text when it has a usable Devanagari
+# text layer, otherwise the page rendered to an image
+def render_pdf_page(doc, page_num):
+    import fitz  # PyMuPDF
+    from PIL import Image
+    
+    started = time.perf_counter()
+    page = doc.load_page(page_num)
+    
+    # Born-digital pages already carry the Hindi text, no need to render them
+    page_text = page.get_text()
+    if has_devanagari_text(page_text):
+        return page_text.strip()
+    
+    # Render only as sharp as the text on this page needs, in grayscale because that is what gets uploaded
+    dpi = choose_render_dpi(page)
+    pix = page.get_pixmap(matrix=fitz.Matrix(dpi/72, dpi/72), colorspace=fitz.csGRAY)
+    
+    # The image reads the pixmap's own sample memory (samples_mv, not the copy pix.samples makes): no PNG
+    # encode/decode and no copy, one byte per pixel. The memoryview does not keep the pixmap alive, the image does
+    image = Image.frombuffer("L", (pix.width, pix.height), pix.samples_mv, "raw", "L", pix.stride, 1)
+    image._pixmap = pix
+    image.info["render_seconds"] = time.perf_counter() - started  # travels with the image, even across processes
+    return image
+
+
+# Function to get the memory a rendered page holds, in bytes
+def page_bytes(image):
+    return image.width * image.height * len(image.getbands())
+
+
+# Function to lazily yield (page number, content) for each page in document order
+# Long documents are rendered by several processes (see rasterization), short ones one page at a time here.
+# So are long ones while other conversions hold the process-wide render slots
+def iter_pdf_pages(doc, total_pages, skip_pages=(), processes=RENDER_PROCESSES):
+    page_nums = [page_num for page_num in range(total_pages) if page_num + 1 not in skip_pages]
+    source = document_source(doc)
+    if processes > 1 and len(page_nums) >= PARALLEL_MIN_PAGES and source is not None:
+        with render_process_slots(processes) as reserved:
+            if reserved > 1:
+                yield from render_pages_parallel(source, page_nums, reserved)
+                return
+    
+    for page_num in page_nums:
+        yield page_num + 1, render_pdf_page(doc, page_num)
+
+
+# Function to extract all pages from PDF at once (kept for callers that need the full list)
+def extract_images_from_pdf(pdf_file, max_pages=PAGE_LIMIT):
+    try:
+        doc, total_pages = open_pdf(pdf_file, max_pages)
+        return list(iter_pdf_pages(doc, total_pages)), total_pages
+    except Exception:
+        logger.exception("Error extracting images from PDF")
+        return [], 0
+
+# Function to convert one page, waiting for a rate limit token first (runs in a worker thread)
+# A page is either extracted Hindi text or a rendered PIL image
+# Returns (page number, Hinglish text, stats) where stats holds timings, upload sizes, retries and,
+# when the page failed, the error
+def convert_page(page_num, page_content, rate_limiter, text_backend="gemini"):
+    stats = {"source": "text" if isinstance(page_content, str) else "image"}
+    if not isinstance(page_content, str) and "render_seconds" in page_content.info:
+        stats["render_seconds"] = page_content.info["render_seconds"]
+    # Offline transliteration never touches the API, so it does not need a rate limit token
+    if isinstance(page_content, str) and text_backend == "offline":
+        stats["waited"] = 0.0
+    else:
+        stats["waited"] = rate_limiter.acquire()
+    
+    # Every retry is a new request, so it takes a rate limit token too
+    def take_token():
+        stats["waited"] += rate_limiter.acquire()
+    
+    started = time.perf_counter()
+    result = None
+    try:
+        if isinstance(page_content, str):
+            result = convert_text(page_content, text_backend, stats=stats, before_retry=take_token)
+        else:
+            result = convert_image(page_content, stats=stats, before_retry=take_token)
+    except Exception as e:
+        # Retries are used up (or the error is not retryable), the stats still show what was tried
+        logger.warning("Error processing page %s: %s", page_num, e)
+        stats["error"] = str(e)
+    finally:
+        # Release the rendered page as soon as it has been converted
+        if not isinstance(page_content, str):
+            page_content.close()
+    stats["elapsed"] = time.perf_counter() - started
+    return page_num, result, stats
+
+
+# Function to convert several rendered pages with batched requests (runs in a worker thread)
+# Returns a list of (page number, Hinglish text, stats), one per page
+def convert_page_batch(pages, rate_limiter):
+    waited = 0.0
+    
+    def take_token():
+        nonlocal waited
+        waited += rate_limiter.acquire()
+    
+    started = time.perf_counter()
+    try:
+        outcomes = convert_image_batch([image for _, image in pages], before_request=take_token)
+    finally:
+        for _, image in pages:
+            image.close()
+    elapsed = time.perf_counter() - started
+    
+    return [
+        (page_num, result, dict(stats, source="image", waited=waited, elapsed=elapsed,
+                                render_seconds=image.info.get("render_seconds", 0.0)))
+        for (page_num, image), (result, stats) in zip(pages, outcomes)
+    ]
+
+
+# Function to build the record reported for every converted page
+def page_record(page_num, text=None, stats=None, error=None):
+    return {"page": page_num, "text": text or None, "error": error, "stats": stats or {}}
+
+
+# Function to build the record of a page that was not sent to the model (blank, or a repeat of `original`)
+def skipped_page_record(page_num, source, reason, original=None):
+    stats = {"source": source, "skipped": reason}
+    if reason == BLANK:
+        return dict(page_record(page_num, stats=stats), text="")
+    stats["duplicate_of"] = original["page"]
+    return page_record(page_num, original["text"], stats, original["error"])
+
+
+# Function to convert the pages of an open PDF, yielding one page record as each page finishes
+# Every page and the finished (or stopped) document are added to the pipeline metrics and logged as JSON,
+# `document` names them in the logs. The other options are those of _convert_pages.
+def convert_pdf_pages(doc, total_pages, *args, document=None, **options):
+    document = document or doc.name or None
+    started = time.perf_counter()
+    outcomes = []  # records without their text, for the document totals
+    try:
+        for record in _convert_pages(doc, total_pages, *args, **options):
+            record_page(record, document)
+            outcomes.append(dict(record, text=None if record["text"] is None else ""))
+            yield record
+    finally:
+        record_document(outcomes, time.perf_counter() - started, document)
+
+
+# Function to convert the pages of an open PDF, yielding one page record as each page finishes
+# Pages are rendered lazily and handed to the worker pool through a bounded window of in-flight pages,
+# so memory stays flat no matter how long the document is and results show up while rendering continues
+# With batch_pages=True, rendered pages are grouped so several of them share one Gemini request
+# With screen_pages=True, blank pages get an empty text and repeated pages reuse the earlier page's result,
+# neither of them costs an API call (see page_screening)
+# Rendered pages count against a memory budget (by default the one shared by the whole process) from the
+# moment they are queued until their conversion finishes, rendering waits while the budget is used up.
+# Pages that rendering processes have finished ahead of this loop are not charged until the loop takes them,
+# at most RENDER_PROCESSES * PAGES_PER_TASK pages per document (see render_pages_parallel)
+def _convert_pages(doc, total_pages, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, max_workers=4,
+                   text_backend="gemini", max_pages_in_flight=None, batch_pages=False, rate_limiter=None, skip_pages=(),
+                   screen_pages=True, render_processes=RENDER_PROCESSES, page_budget=None):
+    # Pages are converted in parallel, the token bucket keeps us inside the API quota
+    rate_limiter = rate_limiter or TokenBucket(requests_per_minute, burst=max_workers)
+    page_budget = page_budget or get_page_memory_budget()
+    max_pages_in_flight = max_pages_in_flight or 2 * max_workers
+    if batch_pages:
+        max_pages_in_flight = max(max_pages_in_flight, MAX_BATCH_PAGES * max_workers)
+    
+    screener = PageScreener() if screen_pages else None
+    converted = {}  # page number -> record, for pages that later pages turned out to repeat
+    waiting = {}  # page number -> [(page number, source)] of repeats waiting for that page's result
+    
+    # Function to turn a finished future into page records, followed by the records of its repeats
+    def collect(future, page_nums):
+        try:
+            outcome = future.result()
+            # Single pages return one tuple, batches return a list of them
+            records = [
+                page_record(page_num, result, stats, error=None if result else stats.get("error", "Empty response"))
+                for page_num, result, stats in (outcome if isinstance(outcome, list) else [outcome])
+            ]
+        except Exception as e:
+            logger.warning("Error processing pages %s: %s", page_nums, e)
+            records = [page_record(page_num, error=str(e)) for page_num in page_nums]
+        for record in list(records):
+            converted[record["page"]] = record
+            records += [skipped_page_record(page_num, source, DUPLICATE, record)
+                        for page_num, source in waiting.pop(record["page"], [])]
+        return records
+    
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {}  # future -> page numbers it converts
+    batch = []  # rendered pages waiting to be sent together
+    batch_bytes = 0
+    
+    # Function to hand memory back to the budget once the pages using it are converted (or cancelled)
+    def release_when_done(future, nbytes):
+        future.add_done_callback(lambda _: page_budget.release(nbytes))
+    
+    def submit_batch():
+        nonlocal batch_bytes
+        future = executor.submit(convert_page_batch, list(batch), rate_limiter)
+        pending[future] = [page_num for page_num, _ in batch]
+        release_when_done(future, batch_bytes)
+        batch.clear()
+        batch_bytes = 0
+    
+    try:
+        for page_num, page_content in iter_pdf_pages(doc, total_pages, skip_pages, render_processes):
+            reason, original = screener.screen(page_num, page_content) if screener else (None, None)
+            if reason:
+                source = "text" if isinstance(page_content, str) else "image"
+                if source == "image":
+                    page_content.close()
+                if reason == BLANK:
+                    yield skipped_page_record(page_num, source, BLANK)
+                elif original in converted:
+                    yield skipped_page_record(page_num, source, reason, converted[original])
+                else:
+                    waiting.setdefault(original, []).append((page_num, source))
+                continue
+            
+            nbytes = 0 if isinstance(page_content, str) else page_bytes(page_content)
+            if nbytes and not page_budget.try_acquire(nbytes):
+                # Pages held back for a batch use memory too, send them off before waiting for some
+                if batch:
+                    submit_batch()
+                page_budget.acquire(nbytes)
+            
+            if batch_pages and nbytes:
+                batch.append((page_num, page_content))
+                batch_bytes += nbytes
+                if len(batch) >= MAX_BATCH_PAGES:
+                    submit_batch()
+            else:
+                future = executor.submit(convert_page, page_num, page_content, rate_limiter, text_backend)
+                pending[future] = [page_num]
+                release_when_done(future, nbytes)
+            del page_content
+            
+            # Bounded queue: stop rendering until a worker frees up a slot
+            while pending and sum(map(len, pending.values())) + len(batch) >= max_pages_in_flight:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield from collect(future, pending.pop(future))
+        
+        if batch:
+            submit_batch()
+        for future in as_completed(list(pending)):
+            yield from collect(future, pending.pop(future))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        # Stopped early: pages never sent still hold their share of the budget
+        for _, image in batch:
+            image.close()
+        page_budget.release(batch_bytes)
+
+
+# Function to convert a PDF of any length with a checkpoint after every page
+# Pages already in the checkpoint store are skipped, each newly converted page is saved the moment it
+# arrives, so an interrupted run picks up where it stopped. Yields page records like convert_pdf_pages.
+def convert_pdf_checkpointed(doc, total_pages, store, key, filename=None, **options):
+    store.start(key, filename, total_pages)
+    completed = store.completed_pages(key)
+    options.setdefault("document", filename)
+    for record in convert_pdf_pages(doc, total_pages, skip_pages=set(completed), **options):
+        store.save_page(key, record)
+        yield record
+
+
+# Function to convert a long digital Hindi text, yielding one record per chunk as each chunk finishes
+# The text is cut at sentence boundaries into chunks (see text_documents) that are converted in parallel under
+# the rate limit; record["page"] is the chunk number and stats["separator"] the whitespace that followed the
+# chunk, so text_documents.join_chunks can put the results back together in order
+def convert_text_document(text, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, max_workers=4, text_backend="gemini",
+                          rate_limiter=None, max_chunk_tokens=MAX_CHUNK_TOKENS, skip_chunks=(), document=None):
+    rate_limiter = rate_limiter or TokenBucket(requests_per_minute, burst=max_workers)
+    chunks = chunk_text(text, max_chunk_tokens)
+    started = time.perf_counter()
+    outcomes = []  # records without their text, for the document totals
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(convert_page, number, chunk, rate_limiter, text_backend): separator
+            for number, (chunk, separator) in enumerate(chunks, start=1)
+            if number not in skip_chunks
+        }
+        try:
+            for future in as_completed(futures):
+                number, result, stats = future.result()
+                stats["separator"] = futures[future]
+                record = page_record(number, result, stats,
+                                     error=None if result else stats.get("error", "Empty response"))
+                record_page(record, document)
+                outcomes.append(dict(record, text=None if result is None else ""))
+                yield record
+        finally:
+            # A consumer that stops early does not wait for (or pay for) the chunks still queued
+            for future in futures:
+                future.cancel()
+            record_document(outcomes, time.perf_counter() - started, document)
+
+
+# Function to join page texts back together in document order (blank pages leave no gap)
+def combine_page_texts(page_texts):
+    return "\n\n".join(page_texts[page_num] for page_num in sorted(page_texts) if page_texts[page_num]).strip()
+
+
+# Function to convert a whole PDF without any UI, returns the combined Hinglish text
+def convert_pdf(pdf_file, max_pages=PAGE_LIMIT, **options):
+    doc, total_pages = open_pdf(pdf_file, max_pages)
+    try:
+        page_texts = {}
+        for record in convert_pdf_pages(doc, total_pages, **options):
+            if record["text"]:
+                page_texts[record["page"]] = record["text"]
+        return combine_page_texts(page_texts)
+    finally:
+        doc.close()
+
+# Function to create a download link for text as PDF
+def get_download_link(text, filename="hinglish_translation.pdf", link_text="Download Hinglish Text as PDF/ Hinglish Text Download Kare"):
+    """Generates a link to download the text as a PDF file"""
+    pdf_bytes = text_to_pdf(text)
+    b64 = base64.b64encode(pdf_bytes.getvalue()).decode()
+    href = f'<a href="data:application/pdf;base64,{b64}" download="{filename}">{link_text}</a>'
+    return href
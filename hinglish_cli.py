@@ -0,0 +1,268 @@
+# Command line batch converter, no Streamlit needed
+# Converts images, PDFs and Hindi text files (files, directories or glob patterns) and appends one JSON line
+# per page (per chunk of a text file), so long runs can be watched with `tail -f` and resumed after a crash by
+# re-running the same command.
+#
+# Example:
+#   GEMINI_API_KEY=... python hinglish_cli.py scans/ "notices/*.pdf" --output results.jsonl --workers 4
+
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from ai_processing import (configure_api, configure_pool, create_system_instruction, get_requests_per_minute,
+                           set_backend, set_retry_policy, DEFAULT_REQUESTS_PER_MINUTE, TEXT_BACKENDS)
+from model_backends import StubBackend
+from model_routing import ModelRouter
+from doc_file_processing import open_pdf, convert_pdf_pages, convert_page, convert_text_document, page_record, PAGE_LIMIT
+from text_documents import read_text_file, TEXT_EXTENSIONS
+from page_screening import screening_summary
+from metrics import format_profile, profiled, record_page, render_prometheus, JsonLogFormatter
+from rate_limiting import TokenBucket
+from resilience import RetryPolicy
+
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+PDF_EXTENSIONS = (".pdf",)
+
+logger = logging.getLogger("hinglish_cli")
+
+
+# Function to expand files, directories and glob patterns into a sorted list of convertible files
+def collect_input_files(inputs):
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = [os.path.join(root, name) for root, _, names in os.walk(item) for name in names]
+        else:
+            candidates = glob.glob(item, recursive=True) or [item]
+        for path in candidates:
+            if path.lower().endswith(IMAGE_EXTENSIONS + PDF_EXTENSIONS + TEXT_EXTENSIONS) and os.path.isfile(path):
+                files.append(os.path.abspath(path))
+    return sorted(set(files))
+
+
+# Function to read the pages already converted in a previous run, returns {file: set of page numbers}
+def load_completed_pages(output_path):
+    completed = {}
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as output:
+        for line in output:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by a crash
+            if record.get("text") is not None:
+                completed.setdefault(record["file"], set()).add(record["page"])
+    return completed
+
+
+# Function to append one page record to the JSONL output and flush it straight away
+def write_record(output, file_path, record):
+    stats = record.get("stats", {})
+    line = {
+        "file": file_path,
+        "page": record["page"],
+        "text": record["text"],
+        "error": record["error"],
+        "seconds": round(stats.get("elapsed", 0.0), 3),
+        "waited_seconds": round(stats.get("waited", 0.0), 3),
+        "source": stats.get("source"),
+        "backend": stats.get("backend"),
+        "offline_fallback": stats.get("offline_fallback"),
+        "payload_bytes": stats.get("payload_bytes"),
+        "retries": stats.get("retries", 0),
+        "backoff_seconds": round(stats.get("backoff_seconds", 0.0) + stats.get("breaker_seconds", 0.0), 3),
+        "hedged": stats.get("hedged", 0),
+        "skipped": stats.get("skipped"),
+        "duplicate_of": stats.get("duplicate_of"),
+        "separator": stats.get("separator"),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+    }
+    output.write(json.dumps(line, ensure_ascii=False) + "\n")
+    output.flush()
+
+
+# Function to convert one image file (used from the image worker pool)
+def convert_image_file(path, rate_limiter, text_backend):
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            image.load()
+            page_num, result, stats = convert_page(1, image.copy(), rate_limiter, text_backend)
+        return page_record(page_num, result, stats, error=None if result else stats.get("error", "Empty response"))
+    except Exception as e:
+        return {"page": 1, "text": None, "error": str(e), "stats": {}}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert Hindi text in images and PDFs to Hinglish.")
+    parser.add_argument("inputs", nargs="+", help="Image/PDF/.txt/.docx files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="hinglish_results.jsonl", help="JSONL file to append page results to")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Number of pages converted in parallel")
+    parser.add_argument("--rpm", type=int,
+                        help="Gemini requests per minute across all workers (default: 15 per pooled key and model)")
+    parser.add_argument("--text-backend", choices=list(TEXT_BACKENDS), default="gemini",
+                        help="Engine for text files and PDF pages that already have a Hindi text layer")
+    parser.add_argument("--batch-pages", action="store_true", help="Send several scanned pages per request")
+    parser.add_argument("--max-pages", type=int, default=PAGE_LIMIT, help="Pages converted per PDF (0 for all)")
+    parser.add_argument("--no-screening", action="store_true",
+                        help="Send blank and repeated pages to the model too instead of skipping them")
+    parser.add_argument("--no-resume", action="store_true", help="Convert every page even if the output already has it")
+    parser.add_argument("--api-key", help="Gemini API key (defaults to GEMINI_API_KEY, or the GEMINI_API_KEYS pool)")
+    parser.add_argument("--api-keys", nargs="+", help="Several Gemini API keys, requests are spread over all of them")
+    parser.add_argument("--models", nargs="+", help="Gemini models to spread requests over (with --api-keys)")
+    parser.add_argument("--fast-model",
+                        help="Send simple pages to this faster, cheaper model and dense pages to the main model "
+                             "(defaults to GEMINI_FAST_MODEL)")
+    parser.add_argument("--max-attempts", type=int, default=4, help="Attempts per request for 429, 5xx and timeouts")
+    parser.add_argument("--hedge-after", type=float,
+                        help="Send a duplicate request when one has not answered after this many seconds")
+    parser.add_argument("--metrics-file", help="Write the run's metrics (Prometheus text format) to this file at the end")
+    parser.add_argument("--profile", help="Profile the run (cProfile + tracemalloc) and write the report to this file")
+    parser.add_argument("--log-json", action="store_true",
+                        help="Log one JSON object per line, including a metrics event per page and per document")
+    # Offline stand-in for Gemini, to measure throughput, concurrency and retries without a key or quota
+    parser.add_argument("--stub", action="store_true", help="Use the local stub model instead of Gemini")
+    parser.add_argument("--stub-latency", default="lognormal:0,0.4",
+                        help="Stub latency distribution: fixed:S, uniform:MIN,MAX, normal:MEAN,SD or lognormal:MU,SIGMA")
+    parser.add_argument("--stub-429-rate", type=float, default=0.0, help="Fraction of stub calls failing with 429")
+    parser.add_argument("--stub-error-rate", type=float, default=0.0, help="Fraction of stub calls failing with 503")
+    parser.add_argument("--stub-timeout-rate", type=float, default=0.0, help="Fraction of stub calls failing with 504")
+    parser.add_argument("--stub-seed", type=int, default=0, help="Random seed for repeatable stub runs")
+    parser.add_argument("--stub-fast-latency", default="lognormal:-0.7,0.4",
+                        help="Latency of the stub standing in for --fast-model")
+    return parser.parse_args(argv)
+
+
+# Function to convert every file, appending page records to the output, returns the number of failed pages
+def convert_files(files, args, rate_limiter, completed):
+    failures = 0
+    with open(args.output, "a", encoding="utf-8") as output:
+        # Images are independent single pages, convert them all through one worker pool
+        images = [path for path in files if path.lower().endswith(IMAGE_EXTENSIONS) and path not in completed]
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {path: executor.submit(convert_image_file, path, rate_limiter, args.text_backend) for path in images}
+            for path, future in futures.items():
+                record = future.result()
+                record_page(record, path)
+                failures += record["text"] is None
+                write_record(output, path, record)
+                logger.info("%s: %s", path, "done" if record["text"] else record["error"])
+
+        # PDFs stream their pages through the same rate limit, skipping pages finished in an earlier run
+        for path in (path for path in files if path.lower().endswith(PDF_EXTENSIONS)):
+            try:
+                doc, total_pages = open_pdf(path, args.max_pages or None)
+            except Exception as e:
+                logger.error("%s: could not open PDF: %s", path, e)
+                failures += 1
+                continue
+            skip_pages = completed.get(path, set())
+            if len(skip_pages) >= total_pages:
+                doc.close()
+                continue
+            records = []
+            try:
+                for record in convert_pdf_pages(doc, total_pages, max_workers=args.workers,
+                                                text_backend=args.text_backend, batch_pages=args.batch_pages,
+                                                rate_limiter=rate_limiter, skip_pages=skip_pages,
+                                                screen_pages=not args.no_screening, document=path):
+                    records.append(record)
+                    failures += record["text"] is None
+                    write_record(output, path, record)
+                    logger.info("%s page %s/%s: %s", path, record["page"], total_pages,
+                                record["error"] or record["stats"].get("skipped") or "done")
+            except Exception as e:
+                logger.error("%s: conversion stopped: %s", path, e)
+                failures += 1
+            finally:
+                doc.close()
+            screening = screening_summary(records)
+            if screening["skipped_calls"]:
+                logger.info("%s: skipped %d calls (%d blank, %d repeated pages), about %.1fs saved", path,
+                            screening["skipped_calls"], screening["blank_pages"], screening["duplicate_pages"],
+                            screening["saved_seconds"])
+
+        # Text files are cut into chunks at sentence boundaries, the chunks of one file convert in parallel
+        for path in (path for path in files if path.lower().endswith(TEXT_EXTENSIONS)):
+            try:
+                with open(path, "rb") as text_file:
+                    text = read_text_file(path, text_file.read())
+                for record in convert_text_document(text, max_workers=args.workers, text_backend=args.text_backend,
+                                                    rate_limiter=rate_limiter, skip_chunks=completed.get(path, set()),
+                                                    document=path):
+                    failures += record["text"] is None
+                    write_record(output, path, record)
+                    logger.info("%s chunk %s: %s", path, record["page"], record["error"] or "done")
+            except Exception as e:
+                logger.error("%s: conversion stopped: %s", path, e)
+                failures += 1
+
+    return failures
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.log_json:
+        logging.getLogger().handlers[0].setFormatter(JsonLogFormatter())
+    else:
+        logging.getLogger("hinglish.metrics").setLevel(logging.WARNING)  # per-page events only in JSON logs
+
+    files = collect_input_files(args.inputs)
+    if not files:
+        logger.error("No images or PDFs found in %s", args.inputs)
+        return 1
+
+    # Text files transliterated offline never reach the model, so a run of only those needs no API key
+    needs_model = args.text_backend != "offline" or not all(path.lower().endswith(TEXT_EXTENSIONS) for path in files)
+    if args.stub:
+        stub = StubBackend(latency=args.stub_latency, rate_limit_rate=args.stub_429_rate,
+                           server_error_rate=args.stub_error_rate, timeout_rate=args.stub_timeout_rate,
+                           seed=args.stub_seed, system_instruction=create_system_instruction())
+        if args.fast_model:
+            fast_stub = StubBackend(latency=args.stub_fast_latency, rate_limit_rate=args.stub_429_rate,
+                                    server_error_rate=args.stub_error_rate, timeout_rate=args.stub_timeout_rate,
+                                    seed=args.stub_seed + 1, model_name=args.fast_model,
+                                    system_instruction=create_system_instruction())
+            set_backend(ModelRouter(fast_stub, stub))
+        else:
+            set_backend(stub)
+    elif not needs_model:
+        pass
+    elif args.api_keys:
+        configure_pool(args.api_keys, args.models, fast_model=args.fast_model)
+    else:
+        configure_api(args.api_key, fast_model=args.fast_model)
+    set_retry_policy(RetryPolicy(max_attempts=args.max_attempts, hedge_after=args.hedge_after))
+    completed = {} if args.no_resume else load_completed_pages(args.output)
+    rate_limiter = TokenBucket(args.rpm or (get_requests_per_minute() if needs_model else DEFAULT_REQUESTS_PER_MINUTE),
+                               burst=args.workers)
+    started = time.perf_counter()
+    with profiled(bool(args.profile)) as report:
+        failures = convert_files(files, args, rate_limiter, completed)
+
+    logger.info("Finished %d files in %.1fs with %d failed pages", len(files), time.perf_counter() - started, failures)
+    if args.stub:
+        logger.info("Stub model stats: %s", stub.get_stats())
+    if args.metrics_file:
+        with open(args.metrics_file, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(render_prometheus())
+    if args.profile:
+        with open(args.profile, "w", encoding="utf-8") as profile_file:
+            profile_file.write(format_profile(report))
+        logger.info("Profile written to %s (peak traced memory %.1f MB)", args.profile, report["tracemalloc_peak_mb"])
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# Image preparation before upload to Gemini
+# Picks a render DPI from the size of the text on the page, converts to grayscale, trims blank
+# margins and encodes a compact JPEG/WebP under a byte budget, so we upload kilobytes instead of megabytes.
+
+import statistics
+from io import BytesIO
+
+
+# Rendering: aim for this many pixels of text height, which is plenty for the model to read Devanagari
+TARGET_TEXT_HEIGHT_PX = 40
+MIN_RENDER_DPI = 100
+MAX_RENDER_DPI = 300
+DEFAULT_RENDER_DPI = 200
+
+# Encoding
+DEFAULT_MAX_BYTES = 500 * 1024
+DEFAULT_FORMAT = "JPEG"  # "JPEG" or "WEBP"
+MAX_LONG_SIDE = 3072  # Gemini downsizes anything larger anyway
+BLANK_THRESHOLD = 235  # gray levels above this count as paper
+MARGIN_PADDING = 16
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+# Function to measure text line heights (in pixels) from the row ink profile of an image
+def estimate_text_height(image):
+    from PIL import Image
+    
+    gray = image.convert("L")
+    # Averaging every row down to one pixel gives the row ink profile without touching each pixel in Python
+    row_means = list(gray.resize((1, gray.height), Image.BOX).getdata())
+    gray.close()
+
+    text_rows = [mean < BLANK_THRESHOLD for mean in row_means]
+    runs = []
+    run = 0
+    for is_text in text_rows:
+        if is_text:
+            run += 1
+        elif run:
+            runs.append(run)
+            run = 0
+    if run:
+        runs.append(run)
+
+    # Very short runs are rules and specks, not lines of text
+    runs = [run for run in runs if run >= 3]
+    return statistics.median(runs) if runs else None
+
+
+# Function to choose the render DPI for a PDF page from the size of its text
+def choose_render_dpi(page):
+    import fitz  # PyMuPDF
+    from PIL import Image
+    
+    # Vector text (even in legacy fonts we cannot extract) tells us its font size directly
+    sizes = [
+        span["size"]
+        for block in page.get_text("dict").get("blocks", [])
+        for line in block.get("lines", [])
+        for span in line.get("spans", [])
+        if span.get("text", "").strip()
+    ]
+    if sizes:
+        text_height_pt = statistics.median(sizes)
+    else:
+        # Scanned page: probe at 72 DPI, where one pixel is one point
+        probe = page.get_pixmap(matrix=fitz.Matrix(1, 1), colorspace=fitz.csGRAY)
+        probe_image = Image.frombytes("L", (probe.width, probe.height), probe.samples)
+        text_height_pt = estimate_text_height(probe_image)
+        probe_image.close()
+        if not text_height_pt:
+            return DEFAULT_RENDER_DPI
+
+    dpi = 72 * TARGET_TEXT_HEIGHT_PX / text_height_pt
+    return int(min(MAX_RENDER_DPI, max(MIN_RENDER_DPI, dpi)))
+
+
+# Function to crop away blank paper around the text
+def trim_margins(gray):
+    ink = gray.point(lambda value: 255 if value < BLANK_THRESHOLD else 0)
+    bbox = ink.getbbox()
+    ink.close()
+    if not bbox:
+        return gray
+    left, top, right, bottom = bbox
+    return gray.crop((
+        max(0, left - MARGIN_PADDING),
+        max(0, top - MARGIN_PADDING),
+        min(gray.width, right + MARGIN_PADDING),
+        min(gray.height, bottom + MARGIN_PADDING),
+    ))
+
+
+# Function to turn a PIL image into a compact upload payload, returns (payload, stats)
+def prepare_image(image, max_bytes=DEFAULT_MAX_BYTES, image_format=DEFAULT_FORMAT):
+    from PIL import Image, ImageOps
+    
+    original_bytes = image.width * image.height * len(image.getbands())
+
+    gray = trim_margins(ImageOps.grayscale(image))
+    if max(gray.size) > MAX_LONG_SIDE:
+        scale = MAX_LONG_SIDE / max(gray.size)
+        gray = gray.resize((round(gray.width * scale), round(gray.height * scale)), Image.LANCZOS)
+
+    # Lower the quality first, then the resolution, until the payload fits the budget
+    quality = 85
+    while True:
+        buffer = BytesIO()
+        gray.save(buffer, format=image_format, quality=quality, optimize=True)
+        data = buffer.getvalue()
+        if len(data) <= max_bytes or (quality <= 40 and min(gray.size) <= 512):
+            break
+        if quality > 40:
+            quality -= 15
+        else:
+            gray = gray.resize((round(gray.width * 0.8), round(gray.height * 0.8)), Image.LANCZOS)
+
+    stats = {
+        "original_bytes": original_bytes,
+        "payload_bytes": len(data),
+        "saved_bytes": original_bytes - len(data),
+        "width": gray.width,
+        "height": gray.height,
+        "quality": quality,
+    }
+    gray.close()
+    return {"mime_type": MIME_TYPES[image_format], "data": data}, stats
@@ -0,0 +1,425 @@
+# Asynchronous conversion job service
+# Jobs are kept in a SQLite queue on disk and run by a fixed pool of worker threads, so many Streamlit
+# sessions share one worker fleet (and one rate limit) instead of each blocking its own script run.
+#
+# HTTP API (JSON):
+#   POST /jobs?kind=pdf|image|text&filename=...&text_backend=...&batch_pages=0|1&profile=0|1   body: raw file bytes
+#       -> {"id": ...}
+#   GET  /jobs/<id>          -> status, per-page progress and errors
+#   GET  /jobs/<id>/result   -> {"id": ..., "text": ...}, 409 while the job is still running
+#   GET  /jobs/<id>/profile  -> cProfile + tracemalloc report (plain text) of a job submitted with profile=1
+#   GET  /metrics            -> pipeline metrics of this process in the Prometheus text format
+#
+# Run:
+#   GEMINI_API_KEY=... python job_service.py --port 8765 --workers 4 --rpm 15
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ai_processing import configure_api, get_requests_per_minute
+from doc_file_processing import (open_pdf, convert_pdf_pages, convert_page, convert_text_document, page_record,
+                                 combine_page_texts, PAGE_LIMIT)
+from text_documents import chunk_text, join_chunks, read_text_file
+from rate_limiting import TokenBucket
+from metrics import format_profile, profiled, record_page, render_prometheus
+from uploads import copy_stream
+
+
+DEFAULT_DATA_DIR = os.environ.get("HINGLISH_JOB_DIR", ".hinglish_jobs")
+JOB_KINDS = ("pdf", "image", "text")
+FINISHED_STATUSES = ("done", "failed")
+
+logger = logging.getLogger("job_service")
+
+
+class JobStore:
+    """Persistent job queue: job rows plus one row per converted page."""
+
+    def __init__(self, data_dir=DEFAULT_DATA_DIR):
+        self.data_dir = data_dir
+        self.upload_dir = os.path.join(data_dir, "uploads")
+        self.profile_dir = os.path.join(data_dir, "profiles")
+        os.makedirs(self.upload_dir, exist_ok=True)
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(data_dir, "jobs.sqlite3"), check_same_thread=False)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                filename TEXT,
+                options TEXT NOT NULL,
+                status TEXT NOT NULL,
+                total_pages INTEGER,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                job_id TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                text TEXT,
+                error TEXT,
+                stats TEXT,
+                PRIMARY KEY (job_id, page)
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+            """
+        )
+        # Jobs that were running when the service stopped go back to the queue, finished pages are kept
+        self.db.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+        self.db.commit()
+
+    def upload_path(self, job_id):
+        return os.path.join(self.upload_dir, job_id)
+
+    def profile_path(self, job_id):
+        return os.path.join(self.profile_dir, f"{job_id}.txt")
+
+    # `data` is the upload's bytes or a file object, which is copied to disk in chunks (`length` bytes of it)
+    def submit(self, kind, data, filename=None, options=None, length=None):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        with open(self.upload_path(job_id), "wb") as upload:
+            if isinstance(data, bytes):
+                upload.write(data)
+            else:
+                copy_stream(data, upload, length)
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO jobs (id, kind, filename, options, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, filename, json.dumps(options or {}), now, now),
+            )
+            self.db.commit()
+        return job_id
+
+    # Function to atomically take the oldest queued job, returns None when the queue is empty
+    def claim(self):
+        with self.lock:
+            row = self.db.execute(
+                "SELECT id, kind, filename, options FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (time.time(), row[0]))
+            self.db.commit()
+        return {"id": row[0], "kind": row[1], "filename": row[2], "options": json.loads(row[3])}
+
+    def set_total_pages(self, job_id, total_pages):
+        with self.lock:
+            self.db.execute("UPDATE jobs SET total_pages = ?, updated_at = ? WHERE id = ?",
+                            (total_pages, time.time(), job_id))
+            self.db.commit()
+
+    def save_page(self, job_id, record):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO pages (job_id, page, text, error, stats) VALUES (?, ?, ?, ?, ?)",
+                (job_id, record["page"], record["text"], record["error"], json.dumps(record.get("stats", {}))),
+            )
+            self.db.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+            self.db.commit()
+
+    def finish(self, job_id, error=None):
+        with self.lock:
+            self.db.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                            ("failed" if error else "done", error, time.time(), job_id))
+            self.db.commit()
+        if os.path.exists(self.upload_path(job_id)):
+            os.remove(self.upload_path(job_id))
+
+    def completed_pages(self, job_id):
+        with self.lock:
+            rows = self.db.execute("SELECT page FROM pages WHERE job_id = ? AND text IS NOT NULL", (job_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    def status(self, job_id):
+        with self.lock:
+            job = self.db.execute(
+                "SELECT kind, filename, status, total_pages, error, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if job is None:
+                return None
+            pages = self.db.execute(
+                "SELECT page, text IS NOT NULL, error FROM pages WHERE job_id = ? ORDER BY page", (job_id,)
+            ).fetchall()
+        kind, filename, status, total_pages, error, created_at, updated_at = job
+        return {
+            "id": job_id,
+            "kind": kind,
+            "filename": filename,
+            "status": status,
+            "error": error,
+            "total_pages": total_pages,
+            "completed_pages": sum(1 for _, ok, _ in pages if ok),
+            "failed_pages": [{"page": page, "error": page_error} for page, ok, page_error in pages if not ok],
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def result(self, job_id):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT page, text, stats FROM pages WHERE job_id = ? ORDER BY page", (job_id,)
+            ).fetchall()
+        # Failed chunks of a text job keep their Hindi text, like in the app; failed PDF pages are left out
+        rows = [(page, text, json.loads(stats or "{}")) for page, text, stats in rows]
+        rows = [(page, text if text is not None else stats.get("hindi_text"), stats) for page, text, stats in rows]
+        # Chunks of a text job are joined with the line breaks that separated them, PDF pages as paragraphs
+        if rows and all("separator" in stats for _, _, stats in rows):
+            return join_chunks((text, stats["separator"]) for _, text, stats in rows)
+        return combine_page_texts({page: text for page, text, _ in rows})
+
+
+class JobWorkers:
+    """Fixed pool of worker threads that drain the job queue under one shared rate limit."""
+
+    def __init__(self, store, workers=2, requests_per_minute=15, page_workers=4, poll_interval=1.0):
+        self.store = store
+        self.workers = workers
+        self.page_workers = page_workers
+        self.poll_interval = poll_interval
+        self.rate_limiter = TokenBucket(requests_per_minute, burst=page_workers)
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{number}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join()
+
+    def _run(self):
+        while not self.stopping.is_set():
+            job = self.store.claim()
+            if job is None:
+                self.stopping.wait(self.poll_interval)
+                continue
+            try:
+                self._process(job)
+                self.store.finish(job["id"])
+            except Exception as e:
+                logger.exception("Job %s failed", job["id"])
+                self.store.finish(job["id"], error=str(e))
+
+    # A job submitted with profile=1 runs under cProfile + tracemalloc, the report is kept even if the job fails
+    def _process(self, job):
+        report = {}
+        try:
+            with profiled(bool(job["options"].get("profile"))) as report:
+                self._convert(job)
+        finally:
+            if report:
+                with open(self.store.profile_path(job["id"]), "w", encoding="utf-8") as profile:
+                    profile.write(format_profile(report))
+
+    def _convert(self, job):
+        job_id, options = job["id"], job["options"]
+        text_backend = options.get("text_backend", "gemini")
+        path = self.store.upload_path(job_id)
+
+        if job["kind"] == "text":
+            # .txt or .docx, cut into chunks that convert in parallel; chunks finished before a restart are kept
+            with open(path, "rb") as upload:
+                text = read_text_file(job["filename"], upload.read())
+            chunks = chunk_text(text)
+            self.store.set_total_pages(job_id, len(chunks))
+            for record in convert_text_document(text, max_workers=self.page_workers, text_backend=text_backend,
+                                                rate_limiter=self.rate_limiter,
+                                                skip_chunks=self.store.completed_pages(job_id), document=job_id):
+                if record["text"] is None:
+                    # The upload is deleted when the job finishes, the result falls back to this text
+                    record["stats"]["hindi_text"] = chunks[record["page"] - 1][0]
+                self.store.save_page(job_id, record)
+        elif job["kind"] == "image":
+            from PIL import Image
+            
+            self.store.set_total_pages(job_id, 1)
+            with Image.open(path) as image:
+                image.load()
+                _, result, stats = convert_page(1, image.copy(), self.rate_limiter, text_backend)
+            record = page_record(1, result, stats, error=None if result else stats.get("error", "Empty response"))
+            record_page(record, job_id)
+            self.store.save_page(job_id, record)
+        else:
+            doc, total_pages = open_pdf(path, options.get("max_pages", PAGE_LIMIT))
+            self.store.set_total_pages(job_id, total_pages)
+            try:
+                # Pages finished before a restart are not converted (or paid for) again
+                for record in convert_pdf_pages(doc, total_pages, max_workers=self.page_workers,
+                                                text_backend=text_backend,
+                                                batch_pages=bool(options.get("batch_pages")),
+                                                rate_limiter=self.rate_limiter,
+                                                skip_pages=self.store.completed_pages(job_id), document=job_id):
+                    self.store.save_page(job_id, record)
+            finally:
+                doc.close()
+
+
+# Function to read the max_pages query parameter: a whole number of pages, 0 meaning no limit (None)
+def parse_max_pages(value):
+    try:
+        max_pages = int(value)
+    except ValueError:
+        raise ValueError(f"max_pages must be a whole number, got {value!r}") from None
+    if max_pages < 0:
+        raise ValueError(f"max_pages must be 0 (no limit) or more, got {max_pages}")
+    return None if max_pages == 0 else max_pages
+
+
+# Function to build the HTTP request handler bound to a job store
+def make_handler(store):
+    class JobRequestHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_text(self, status, text, content_type="text/plain; charset=utf-8"):
+            body = text.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            url = urllib.parse.urlparse(self.path)
+            if url.path.rstrip("/") != "/jobs":
+                return self._send_json(404, {"error": "Not found"})
+            query = dict(urllib.parse.parse_qsl(url.query))
+            options = {
+                "text_backend": query.get("text_backend", "gemini"),
+                "batch_pages": query.get("batch_pages") == "1",
+                "profile": query.get("profile") == "1",
+            }
+            try:
+                if "max_pages" in query:
+                    options["max_pages"] = parse_max_pages(query["max_pages"])
+                # The body goes straight to disk, large uploads are never held in memory as a whole
+                job_id = store.submit(query.get("kind", "pdf"), self.rfile, query.get("filename"), options,
+                                      length=int(self.headers.get("Content-Length", 0)))
+            except ValueError as e:
+                return self._send_json(400, {"error": str(e)})
+            self._send_json(202, {"id": job_id})
+
+        def do_GET(self):
+            parts = [part for part in urllib.parse.urlparse(self.path).path.split("/") if part]
+            if parts == ["metrics"]:
+                return self._send_text(200, render_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+            if len(parts) < 2 or parts[0] != "jobs":
+                return self._send_json(404, {"error": "Not found"})
+            status = store.status(parts[1])
+            if status is None:
+                return self._send_json(404, {"error": "Unknown job"})
+            if len(parts) == 2:
+                return self._send_json(200, status)
+            if parts[2] == "result":
+                if status["status"] not in FINISHED_STATUSES:
+                    return self._send_json(409, {"error": "Job is not finished", "status": status["status"]})
+                return self._send_json(200, {"id": parts[1], "status": status["status"], "text": store.result(parts[1])})
+            if parts[2] == "profile":
+                if not os.path.exists(store.profile_path(parts[1])):
+                    return self._send_json(404, {"error": "No profile for this job (submit it with profile=1)"})
+                with open(store.profile_path(parts[1]), encoding="utf-8") as profile:
+                    return self._send_text(200, profile.read())
+            self._send_json(404, {"error": "Not found"})
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+    return JobRequestHandler
+
+
+class JobServiceClient:
+    """Small HTTP client for the job service, used by the Streamlit app."""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method, path, data=None, headers=None):
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers or {})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    # `data` is bytes or a SpooledUpload, whose file is streamed from disk
+    def submit(self, kind, data, filename=None, text_backend="gemini", batch_pages=False, max_pages=PAGE_LIMIT,
+               profile=False):
+        query = urllib.parse.urlencode({
+            "kind": kind,
+            "filename": filename or "",
+            "text_backend": text_backend,
+            "batch_pages": "1" if batch_pages else "0",
+            "max_pages": max_pages or 0,
+            "profile": "1" if profile else "0",
+        })
+        if getattr(data, "path", None):
+            with open(data.path, "rb") as upload:
+                return self._request("POST", f"/jobs?{query}", data=upload,
+                                     headers={"Content-Length": str(data.size)})["id"]
+        return self._request("POST", f"/jobs?{query}", data=getattr(data, "data", data))["id"]
+
+    def status(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def result(self, job_id):
+        return self._request("GET", f"/jobs/{job_id}/result")["text"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Hindi to Hinglish conversion job service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="Where the job queue and uploads are stored")
+    parser.add_argument("--workers", type=int, default=2, help="Jobs converted at the same time")
+    parser.add_argument("--page-workers", type=int, default=4, help="Parallel pages per PDF job")
+    parser.add_argument("--rpm", type=int,
+                        help="Gemini requests per minute shared by all workers (default: 15 per pooled key)")
+    parser.add_argument("--api-key", help="Gemini API key (defaults to GEMINI_API_KEY, or the GEMINI_API_KEYS pool)")
+    parser.add_argument("--fast-model", help="Model for simple pages, dense pages keep the main model "
+                                             "(defaults to GEMINI_FAST_MODEL)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    configure_api(args.api_key, fast_model=args.fast_model)
+    store = JobStore(args.data_dir)
+    workers = JobWorkers(store, args.workers, args.rpm or get_requests_per_minute(), args.page_workers)
+    workers.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store))
+    logger.info("Job service listening on http://%s:%d with %d workers", args.host, args.port, args.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        workers.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,157 +1,618 @@
-# Main UI in streamlit file
-import streamlit as st
-import google.generativeai as genai
-# from dotenv import load_dotenv
-import os
-from PIL import Image
-import time
-import fitz  # PyMuPDF
-import re
-import base64
-import io
-from io import BytesIO
-import gc
-import fpdf  # Add this for PDF generation
-
-# Importing from rest of the folders - 
-from ai_processing import clean_response, process_image
-from doc_file_processing import text_to_pdf, extract_images_from_pdf, process_pdf, get_download_link
-
-
-
-# Page configuration
-st.set_page_config(
-    page_title="Hindi to Hinglish Converter",
-    page_icon="🔤💬🇮🇳",
-    layout="wide"
-)
-
-# Custom CSS for better UI
-st.markdown("""
-<style>
-    .main-title {
-        font-size: 36px;
-        font-weight: bold;
-        color: #FF4B4B;
-        text-align: center;
-        margin-bottom: 30px;
-    }
-    .sub-title {
-        font-size: 24px;
-        font-weight: bold;
-        color: #0066CC;
-        margin-top: 20px;
-        margin-bottom: 10px;
-    }
-    .info-text {
-        font-size: 16px;
-        color: #404040;
-    }
-    .warning-text {
-        font-size: 14px;
-        color: #FF4B4B;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# App title and description
-st.markdown('<p class="main-title">Hindi to Hinglish Converter</p>', unsafe_allow_html=True)
-st.markdown('<p class="info-text">Convert Hindi text from images or PDFs to Hinglish (Hindi written in Roman script)</p>', unsafe_allow_html=True)
-
-with st.expander("How to Use This App", expanded=False):
-    st.markdown("""
-    ## How to Use the Hindi to Hinglish Converter
-
-    This application converts Hindi text found in images or PDFs to Hinglish (Hindi written in Roman script). Follow these simple steps to use the app:
-    ### Step 1: Select Input Type
-    - Choose either **Image** or **PDF** option depending on your source file
-
-    ### Step 2: Upload Your File
-    - For **Image**: Upload a JPG, JPEG, or PNG file containing Hindi text
-    - For **PDF**: Upload a PDF file containing Hindi text (maximum 10 pages)
-
-    ### Step 3: Convert
-    - Click the **Convert to Hinglish** button to start the conversion process
-    - For PDFs, the app will process each page with a short delay between pages to avoid API rate limits
-
-    ### Step 4: View and Download Results
-    - Once processing is complete, the converted Hinglish text will appear in the text area
-    - Click the **Download Hinglish Text as PDF** link which is in blue color, to save the conversion as a PDF file
-    - The downloaded file will be named using your original filename with "_hinglish_converted" added to it
-
-    ### Notes:
-    - The conversion quality depends on the clarity of the Hindi text in your original file
-    - For better results, ensure your images are clear and text is easily readable
-    - The app processes a maximum of 10 pages for PDF files
-    - There is a built-in delay of 10 seconds between processing PDF pages to avoid API rate limits
-    """)
-
-# Main app interface
-st.markdown('<p class="sub-title">Upload Options</p>', unsafe_allow_html=True)
-
-# Input type selection
-input_type = st.radio("Select input type:", ["Image", "PDF"])
-
-# Set delay
-delay_seconds = 10
-
-# File uploader
-st.markdown('<p class="sub-title">Upload File</p>', unsafe_allow_html=True)
-
-if input_type == "Image":
-    uploaded_file = st.file_uploader("Upload an image with Hindi text", type=["jpg", "jpeg", "png"])
-    
-    if uploaded_file:
-        st.image(uploaded_file, caption="Uploaded Image")
-        
-        if st.button("Convert to Hinglish / Hinglish me convert kare"):
-            # Store image in memory instead of creating a temporary file
-            image_bytes = uploaded_file.getvalue()
-            image = Image.open(BytesIO(image_bytes))
-            
-            try:
-                result = process_image(image)
-                
-                # Close the image to release resources
-                image.close()
-                
-                if result:
-                    st.markdown('<p class="sub-title">Hinglish Output</p>', unsafe_allow_html=True)
-                    st.text_area("Hinglish Text", result, height=250)
-                    
-                    # Get original filename without extension
-                    original_name = os.path.splitext(uploaded_file.name)[0]
-                    download_filename = f"{original_name}_hinglish_converted.pdf"
-                    st.markdown(get_download_link(result, filename=download_filename), unsafe_allow_html=True)
-                    st.toast(":green[__Download From Below / Neeche se Download Kare__]")
-                    st.balloons()
-            except Exception as e:
-                st.error(f"Error: {e}")
-
-else:  # PDF option
-    uploaded_file = st.file_uploader("Upload a PDF with Hindi text (max 10 pages)", type=["pdf"])
-    
-    if uploaded_file:
-        st.info(f"Uploaded: {uploaded_file.name}")
-        
-        if st.button("Convert to Hinglish / Hinglish me convert kare"):
-            try:
-                result = process_pdf(uploaded_file, delay_seconds)
-                
-                if result:
-                    st.markdown('<p class="sub-title">Hinglish Output</p>', unsafe_allow_html=True)
-                    st.text_area("Hinglish Text", result, height=350)
-                    
-                    # Get original filename without extension
-                    original_name = os.path.splitext(uploaded_file.name)[0]
-                    download_filename = f"{original_name}_hinglish_converted.pdf"
-                    st.markdown(get_download_link(result, filename=download_filename), unsafe_allow_html=True)
-                    st.toast(":green[__Download From Below / Neeche se Download Kare__]")
-                    st.balloons()
-            except Exception as e:
-                st.error(f"Error: {e}")
-
-# Footer
-st.markdown("---")
-st.markdown("""Made with 🧠 by [Sourabh Dey](https://linktr.ee/sourabhdey)""")
-st.markdown("Hindi to Hinglish Converter | Powered by Google Gemini API")
+# Main UI in streamlit file
+import time
+
+SCRIPT_STARTED = time.perf_counter()
+
+import streamlit as st
+# from dotenv import load_dotenv
+import os
+from io import BytesIO
+# Gemini, PyMuPDF and PIL are imported on first use inside the modules below, so the first page
+# paints before any of them load
+
+# Importing from rest of the folders - 
+from ai_processing import (configure_api, configure_pool, get_backend, get_requests_per_minute, stream_image,
+                           stream_text, TEXT_BACKENDS)
+from doc_file_processing import (open_pdf, convert_pdf_pages, convert_pdf_checkpointed, convert_text_document,
+                                 combine_page_texts, page_record, PAGE_LIMIT)
+from text_documents import chunk_text, join_chunks, read_text_file, TEXT_EXTENSIONS
+from checkpoints import document_key, get_checkpoint_store
+from page_screening import screening_summary
+from pdf_export import render_pdf
+from conversion_cache import get_conversion_cache
+from rate_limiting import get_page_memory_budget
+from uploads import spool_upload
+from metrics import format_profile, profiled, record_page, render_prometheus
+from job_service import JobServiceClient, FINISHED_STATUSES
+
+
+
+# Page configuration
+st.set_page_config(
+    page_title="Hindi to Hinglish Converter",
+    page_icon="🔤💬🇮🇳",
+    layout="wide"
+)
+
+# Script runs of this session, so show_output can tell an output drawn in this run from an earlier one
+st.session_state['run_number'] = st.session_state.get('run_number', 0) + 1
+
+# Custom CSS for better UI
+st.markdown("""
+<style>
+    .main-title {
+        font-size: 36px;
+        font-weight: bold;
+        color: #FF4B4B;
+        text-align: center;
+        margin-bottom: 30px;
+    }
+    .sub-title {
+        font-size: 24px;
+        font-weight: bold;
+        color: #0066CC;
+        margin-top: 20px;
+        margin-bottom: 10px;
+    }
+    .info-text {
+        font-size: 16px;
+        color: #404040;
+    }
+    .warning-text {
+        font-size: 14px;
+        color: #FF4B4B;
+    }
+</style>
+""", unsafe_allow_html=True)
+
+# App title and description
+st.markdown('<p class="main-title">Hindi to Hinglish Converter</p>', unsafe_allow_html=True)
+st.markdown('<p class="info-text">Convert Hindi text from images or PDFs to Hinglish (Hindi written in Roman script)</p>', unsafe_allow_html=True)
+
+with st.expander("How to Use This App", expanded=False):
+    st.markdown("""
+    ## How to Use the Hindi to Hinglish Converter
+
+    This application converts Hindi text found in images or PDFs to Hinglish (Hindi written in Roman script). Follow these simple steps to use the app:
+    ### Step 1: Select Input Type
+    - Choose **Image**, **PDF** or **Text** depending on your source
+    - For Hindi that is already digital (pasted text, PDFs with selectable text) you can pick the **Offline transliteration** engine, which works instantly without any API calls
+
+    ### Step 2: Upload Your File
+    - For **Image**: Upload a JPG, JPEG, or PNG file containing Hindi text
+    - For **PDF**: Upload a PDF file containing Hindi text (maximum 10 pages)
+
+    ### Step 3: Convert
+    - Click the **Convert to Hinglish** button to start the conversion process
+    - For PDFs, the app converts several pages in parallel while staying inside the API rate limit
+
+    ### Step 4: View and Download Results
+    - Once processing is complete, the converted Hinglish text will appear in the text area
+    - Click the **Download Hinglish Text as PDF** link which is in blue color, to save the conversion as a PDF file
+    - The downloaded file will be named using your original filename with "_hinglish_converted" added to it
+
+    ### Notes:
+    - The conversion quality depends on the clarity of the Hindi text in your original file
+    - For better results, ensure your images are clear and text is easily readable
+    - The app processes a maximum of 10 pages for PDF files
+    - PDF pages are converted in parallel, limited to a fixed number of requests per minute to avoid API rate limits
+    """)
+
+# Function to read the API key from Streamlit secrets (empty when no secrets are configured)
+def get_secret_api_key(name="GEMINI_API_KEY"):
+    try:
+        return st.secrets[name]
+    except (KeyError, FileNotFoundError):
+        return ""
+
+# When a job service is configured, conversions run on its shared worker fleet instead of in this script
+JOB_SERVICE_URL = os.environ.get("HINGLISH_JOB_SERVICE_URL", "")
+JOB_POLL_SECONDS = 2
+job_client = JobServiceClient(JOB_SERVICE_URL) if JOB_SERVICE_URL else None
+
+# Several keys (a list in secrets, or comma separated) are pooled to get more requests per minute
+api_keys = get_secret_api_key("GEMINI_API_KEYS") or os.environ.get("GEMINI_API_KEYS", "")
+if isinstance(api_keys, str):
+    api_keys = [key.strip() for key in api_keys.split(",") if key.strip()]
+
+# Optional faster model for simple pages, dense pages keep the main model (see model_routing)
+fast_model = get_secret_api_key("GEMINI_FAST_MODEL") or os.environ.get("GEMINI_FAST_MODEL") or None
+
+# The Gemini backend is shared by every session of this server process, so only the operator's keys from
+# secrets or the environment are used; a key typed into one browser would serve everyone's pages
+# (the job service brings its own key)
+api_key = get_secret_api_key() or os.environ.get("GEMINI_API_KEY", "")
+if not api_key and not api_keys and not job_client:
+    st.error("No Gemini API key configured. Add GEMINI_API_KEY to .streamlit/secrets.toml or the environment "
+             "and restart the app.")
+    st.stop()
+
+# Configure the API (the Gemini client is built once per key and reused on every rerun)
+if api_key or api_keys:
+    try:
+        if api_keys:
+            configure_pool(list(api_keys), fast_model=fast_model)
+        else:
+            configure_api(api_key, fast_model=fast_model)
+    except Exception as e:
+        st.error(f"Error initializing the API: {e}")
+        st.stop()
+
+
+# Function to show the converted text with its download button (PDF bytes go to the browser as they are)
+# The output is kept in the session: clicking the download button reruns the script without converting,
+# and the last output is shown again from there (see the end of the page)
+def show_output(result, download_filename, height=350):
+    st.session_state['output'] = {"text": result, "pdf": render_pdf(result), "filename": download_filename,
+                                  "height": height, "run": st.session_state.get('run_number')}
+    render_output(st.session_state['output'])
+    st.toast(":green[__Download From Below / Neeche se Download Kare__]")
+    st.balloons()
+
+
+# Function to draw a kept output: the text and its PDF download button
+def render_output(output):
+    st.markdown('<p class="sub-title">Hinglish Output</p>', unsafe_allow_html=True)
+    st.text_area("Hinglish Text", output["text"], height=output["height"])
+    st.download_button("Download Hinglish Text as PDF/ Hinglish Text Download Kare", data=output["pdf"],
+                       file_name=output["filename"], mime="application/pdf")
+
+
+# Function to get the download file name from the original upload name
+def get_download_filename(name):
+    original_name = os.path.splitext(name)[0]
+    return f"{original_name}_hinglish_converted.pdf"
+
+
+# Function to hand a conversion to the job service, the job id is kept in the session so reruns reattach to it
+def submit_job(kind, data, filename, **options):
+    try:
+        job_id = job_client.submit(kind, data, filename, **options)
+        st.session_state['job'] = {"id": job_id, "filename": filename}
+    except Exception as e:
+        st.error(f"Could not reach the conversion service: {e}")
+
+
+# Function to check a submitted job once, returns (finished, combined text)
+# Unfinished jobs show their progress and are checked again on the next rerun, the script never waits on them
+def check_job(job):
+    status = job_client.status(job["id"])
+    total_pages = status["total_pages"] or 0
+    if status["status"] not in FINISHED_STATUSES:
+        if total_pages:
+            st.progress(min(1.0, status["completed_pages"] / total_pages))
+        st.info(f"Job {status['status']}: {status['completed_pages']}/{total_pages or '?'} pages converted")
+        st.button("Refresh job status")  # any click reruns the script, which checks the job again
+        return False, None
+
+    for failed in status["failed_pages"]:
+        st.error(f"Failed to process page {failed['page']}: {failed['error']}")
+    if status["status"] == "failed":
+        st.error(f"Conversion failed: {status['error']}")
+    return True, job_client.result(job["id"])
+
+
+# Function to render a streamed conversion as it arrives, returns the full text once the stream ends
+def show_stream(chunks, placeholder):
+    text = ""
+    for piece in chunks:
+        text += piece
+        placeholder.text(text + " ▌")
+    placeholder.empty()
+    return text.strip()
+
+
+# Function to process pasted Hindi text
+def process_text(text, backend="gemini"):
+    placeholder = st.empty()
+    placeholder.info("Converting text to Hinglish...")
+    stats = {"source": "text"}
+    started = time.perf_counter()
+    try:
+        result = show_stream(stream_text(text, backend, stats), placeholder)
+        record_page(page_record(1, result, dict(stats, elapsed=time.perf_counter() - started)), "pasted text")
+        if stats.get("offline_fallback"):
+            st.warning("Gemini is rate limited right now, the text was transliterated offline instead.")
+        return result
+    except Exception as e:
+        placeholder.empty()
+        record_page(page_record(1, stats=stats, error=str(e)), "pasted text")
+        st.error(f"Error processing text: {e}")
+        return None
+
+
+# Function to process a long Hindi text: its chunks are converted in parallel and joined back in order
+# Chunks that fail keep their Hindi text, so nothing goes missing from the output
+def process_long_text(text, requests_per_minute=15, max_workers=4, text_backend="gemini", name=None):
+    chunks = chunk_text(text)
+    converted = {}
+    offline_parts = 0
+    progress_bar = st.progress(0)
+    status_box = st.empty()
+    started = time.perf_counter()
+    for done, record in enumerate(convert_text_document(text, requests_per_minute, max_workers, text_backend,
+                                                        document=name), start=1):
+        offline_parts += bool(record["stats"].get("offline_fallback"))
+        if record["text"]:
+            converted[record["page"]] = record["text"]
+        else:
+            st.error(f"Failed to convert part {record['page']}, its Hindi text is kept: {record['error']}")
+        progress_bar.progress(done / len(chunks))
+        status_box.text(f"{done}/{len(chunks)} parts converted")
+    status_box.text(f"Converted {len(chunks)} parts with up to {max_workers} parallel requests "
+                    f"in {time.perf_counter() - started:.1f}s")
+    if offline_parts:
+        st.warning(f"Gemini was rate limited, {offline_parts} of {len(chunks)} parts were transliterated "
+                   f"offline instead.")
+    return join_chunks((converted.get(number, chunk), separator)
+                       for number, (chunk, separator) in enumerate(chunks, start=1))
+
+
+# Function to process a single image
+def process_image(image, name=None):
+    placeholder = st.empty()
+    placeholder.info("Converting image to Hinglish...")
+    stats = {"source": "image"}
+    started = time.perf_counter()
+    try:
+        result = show_stream(stream_image(image, stats), placeholder)
+        record_page(page_record(1, result, dict(stats, elapsed=time.perf_counter() - started)), name)
+        return result
+    except Exception as e:
+        placeholder.empty()
+        record_page(page_record(1, stats=stats, error=str(e)), name)
+        st.error(f"Error processing image: {e}")
+        return None
+
+
+# Function to show the report of a profiled conversion (nothing when profiling was off)
+def show_profile(report):
+    if not report:
+        return
+    with st.expander("Profile", expanded=False):
+        if report.get("error"):
+            st.warning(f"Profiling failed, the conversion was not affected: {report['error']}")
+        st.write(f"Peak traced memory: {report['tracemalloc_peak_mb']:.1f} MB")
+        st.download_button("Download profile", format_profile(report), "profile.txt", mime="text/plain")
+        st.text(report["profile"])
+
+
+# Function to process PDF, showing every page as soon as it has been converted
+def process_pdf(pdf_file, requests_per_minute=15, max_workers=4, text_backend="gemini", batch_pages=False):
+    st.info("Extracting pages from PDF...")
+    try:
+        doc, total_pages = open_pdf(pdf_file)
+    except Exception as e:
+        st.error(f"Error extracting images from PDF: {e}")
+        return None
+    
+    if total_pages == 0:
+        st.error("No pages could be extracted from the PDF.")
+        return None
+    if len(doc) > total_pages:
+        st.warning(f"PDF has {len(doc)} pages. Only the first {total_pages} pages will be processed due to the page limit.")
+    
+    page_texts = {}
+    text_pages = 0
+    page_records = []
+    
+    with st.expander("Processing Details", expanded=True):
+        st.markdown(f"**Converting {total_pages} pages with up to {max_workers} parallel requests "
+                    f"({requests_per_minute} requests/minute)**")
+        progress_bar = st.progress(0)
+        
+        try:
+            records = convert_pdf_pages(doc, total_pages, requests_per_minute, max_workers, text_backend,
+                                        batch_pages=batch_pages, document=pdf_file.name)
+            for done, record in enumerate(records, start=1):
+                page_num, stats = record["page"], record["stats"]
+                page_records.append(record)
+                if stats.get("source") == "text":
+                    text_pages += 1
+                
+                if stats.get("skipped") == "blank":
+                    st.info(f"Page {page_num} is blank, skipped without an API call")
+                elif stats.get("skipped") and record["text"]:
+                    page_texts[page_num] = record["text"]
+                    st.info(f"Page {page_num} repeats page {stats['duplicate_of']}, reused its result")
+                elif record["text"]:
+                    page_texts[page_num] = record["text"]
+                    details = f"queued {stats['waited']:.1f}s for rate limit"
+                    if "payload_bytes" in stats:
+                        details += (f", uploaded {stats['payload_bytes'] / 1024:.0f} KB instead of "
+                                    f"{stats['original_bytes'] / 1024 / 1024:.1f} MB")
+                    if stats.get("batch_size", 1) > 1:
+                        details += f", batched with {stats['batch_size'] - 1} other pages"
+                    if stats.get("retries"):
+                        details += (f", {stats['retries']} retries after {', '.join(stats['errors'])} "
+                                    f"({stats['backoff_seconds'] + stats['breaker_seconds']:.1f}s backing off)")
+                    if stats.get("offline_fallback"):
+                        details += ", transliterated offline because Gemini was rate limited"
+                    st.success(f"Page {page_num} processed successfully in {stats['elapsed']:.1f}s ({details})")
+                    st.text(record["text"])
+                else:
+                    st.error(f"Failed to process page {page_num}: {record['error']}")
+                
+                progress_bar.progress(done / total_pages)
+        except Exception as e:
+            st.error(f"Error extracting images from PDF: {e}")
+        finally:
+            doc.close()
+        
+        if text_pages:
+            st.info(f"{text_pages} of {total_pages} pages had a Hindi text layer and skipped image rendering.")
+        screening = screening_summary(page_records)
+        if screening["skipped_calls"]:
+            st.info(f"Skipped {screening['skipped_calls']} API calls ({screening['blank_pages']} blank, "
+                    f"{screening['duplicate_pages']} repeated pages), saving about {screening['saved_seconds']:.0f}s.")
+    
+    # Pages arrive in completion order, put them back in document order before joining them
+    return combine_page_texts(page_texts)
+
+
+# Function to process a PDF of any length, saving every page so a refresh or crash resumes where it stopped
+def process_large_pdf(pdf_file, requests_per_minute=15, max_workers=4, text_backend="gemini", batch_pages=False):
+    try:
+        doc, total_pages = open_pdf(pdf_file, max_pages=None)
+    except Exception as e:
+        st.error(f"Error opening PDF: {e}")
+        return None
+    
+    store = get_checkpoint_store()
+    key = document_key(pdf_file, get_backend().model_name, text_backend)
+    done = len(store.completed_pages(key))
+    if done:
+        st.info(f"Resuming: {done} of {total_pages} pages were already converted and will not be sent again.")
+    
+    progress_bar = st.progress(done / total_pages if total_pages else 0)
+    status_box = st.empty()
+    failed = []
+    try:
+        records = convert_pdf_checkpointed(doc, total_pages, store, key, filename=pdf_file.name,
+                                           requests_per_minute=requests_per_minute, max_workers=max_workers,
+                                           text_backend=text_backend, batch_pages=batch_pages)
+        for record in records:
+            if record["text"] is not None:
+                done += 1
+            else:
+                failed.append(record)
+            progress_bar.progress(done / total_pages)
+            status_box.text(f"{done}/{total_pages} pages converted")
+    except Exception as e:
+        st.error(f"Conversion stopped, converted pages are saved and will be reused on the next run: {e}")
+    finally:
+        doc.close()
+    
+    for record in failed:
+        st.error(f"Failed to process page {record['page']}: {record['error']}")
+    if failed:
+        st.warning(f"{len(failed)} pages failed. Press convert again to retry only those pages.")
+    return combine_page_texts(store.completed_pages(key))
+
+
+# Function to spool the uploaded PDF once per upload (reruns reuse it), removing the previous upload's file
+def get_spooled_upload(uploaded_file):
+    spooled = st.session_state.get('spooled_upload')
+    if spooled and spooled[0] == uploaded_file.file_id:
+        return spooled[1]
+    if spooled:
+        spooled[1].close()
+    upload = spool_upload(uploaded_file)
+    st.session_state['spooled_upload'] = (uploaded_file.file_id, upload)
+    return upload
+
+
+# Main app interface
+st.markdown('<p class="sub-title">Upload Options</p>', unsafe_allow_html=True)
+
+# Input type selection
+input_type = st.radio("Select input type:", ["Image", "PDF", "Text"])
+
+# Engine for Hindi that is already digital (pasted text, PDF pages with a text layer)
+text_backend = st.radio(
+    "Engine for digital Hindi text:",
+    list(TEXT_BACKENDS),
+    format_func=lambda backend: TEXT_BACKENDS[backend],
+    horizontal=True,
+)
+
+# Rate limit for PDF pages (Gemini requests per minute, summed over a key pool) and pages converted in parallel
+requests_per_minute = get_requests_per_minute() if not job_client else 15
+profile_conversion = st.sidebar.checkbox(
+    "Profile the next conversion",
+    help="Runs the conversion under cProfile and tracemalloc and shows where the time and memory went. Slows it down.",
+) if not job_client else False
+max_workers = 4
+
+# File uploader
+st.markdown('<p class="sub-title">Upload File</p>', unsafe_allow_html=True)
+
+if input_type == "Image":
+    uploaded_file = st.file_uploader("Upload an image with Hindi text", type=["jpg", "jpeg", "png"])
+    
+    if uploaded_file:
+        st.image(uploaded_file, caption="Uploaded Image")
+        
+        if st.button("Convert to Hinglish / Hinglish me convert kare"):
+            if job_client:
+                submit_job("image", uploaded_file.getvalue(), uploaded_file.name)
+            else:
+                # Store image in memory instead of creating a temporary file
+                from PIL import Image
+                
+                image_bytes = uploaded_file.getvalue()
+                image = Image.open(BytesIO(image_bytes))
+                
+                try:
+                    with profiled(profile_conversion) as report:
+                        result = process_image(image, uploaded_file.name)
+                    show_profile(report)
+                    
+                    # Close the image to release resources
+                    image.close()
+                    
+                    if result:
+                        show_output(result, get_download_filename(uploaded_file.name), height=250)
+                except Exception as e:
+                    st.error(f"Error: {e}")
+
+elif input_type == "Text":
+    uploaded_file = st.file_uploader("Upload a .txt or .docx file with Hindi text, or paste the text below",
+                                     type=[extension.lstrip(".") for extension in TEXT_EXTENSIONS])
+    text_name = uploaded_file.name if uploaded_file else "hindi_text.txt"
+    if uploaded_file:
+        try:
+            hindi_text = read_text_file(uploaded_file.name, uploaded_file.getvalue())
+        except Exception as e:
+            st.error(f"Could not read {uploaded_file.name}: {e}")
+            hindi_text = ""
+        st.caption(f"{len(hindi_text):,} characters")
+    else:
+        hindi_text = st.text_area("Paste Hindi text", height=250)
+    
+    if hindi_text.strip():
+        # Long texts are cut at sentence boundaries and the parts are converted in parallel
+        chunk_count = len(chunk_text(hindi_text))
+        if chunk_count > 1:
+            st.caption(f"Long text: converted as {chunk_count} parts with up to {max_workers} parallel requests.")
+        if st.button("Convert to Hinglish / Hinglish me convert kare"):
+            if job_client:
+                data = uploaded_file.getvalue() if uploaded_file else hindi_text.encode("utf-8")
+                submit_job("text", data, text_name, text_backend=text_backend)
+            else:
+                try:
+                    with profiled(profile_conversion) as report:
+                        if chunk_count > 1:
+                            result = process_long_text(hindi_text, requests_per_minute, max_workers, text_backend,
+                                                       text_name)
+                        else:
+                            result = process_text(hindi_text, text_backend)
+                    show_profile(report)
+                    
+                    if result:
+                        show_output(result, get_download_filename(text_name), height=250)
+                except Exception as e:
+                    st.error(f"Error: {e}")
+
+else:  # PDF option
+    uploaded_file = st.file_uploader("Upload a PDF with Hindi text (max 10 pages, unless large document mode is on)", type=["pdf"])
+    
+    if uploaded_file:
+        st.info(f"Uploaded: {uploaded_file.name}")
+        upload = get_spooled_upload(uploaded_file)
+        if upload.path:
+            st.caption(f"Large upload ({upload.size / 2**20:.0f} MB) spooled to disk: pages are read from the file as "
+                       f"they are rendered, and rendered pages are capped at "
+                       f"{get_page_memory_budget().limit_bytes / 2**20:.0f} MB for the whole server.")
+        batch_pages = st.checkbox(
+            "Send several pages per request (faster for short pages)",
+            help="Packs a few scanned pages into one Gemini request. Pages that cannot be split back apart are retried one by one.",
+        )
+        large_document = st.checkbox(
+            "Large document mode (no page limit, resumable)",
+            help="Converts every page and saves each one as it finishes. If the run is interrupted, upload the same file again to continue where it stopped.",
+        )
+        
+        if st.button("Convert to Hinglish / Hinglish me convert kare"):
+            if job_client:
+                submit_job("pdf", upload, uploaded_file.name, text_backend=text_backend,
+                           batch_pages=batch_pages, max_pages=0 if large_document else PAGE_LIMIT)
+            else:
+                try:
+                    with profiled(profile_conversion) as report:
+                        if large_document:
+                            result = process_large_pdf(upload, requests_per_minute, max_workers, text_backend,
+                                                       batch_pages=batch_pages)
+                        else:
+                            result = process_pdf(upload, requests_per_minute, max_workers, text_backend,
+                                                 batch_pages=batch_pages)
+                    show_profile(report)
+                    
+                    if result:
+                        show_output(result, get_download_filename(uploaded_file.name))
+                except Exception as e:
+                    st.error(f"Error: {e}")
+
+# A submitted job is checked once per rerun until it finishes, so widget interactions do not lose it
+job_running = False
+if job_client and st.session_state.get('job'):
+    job = st.session_state['job']
+    try:
+        finished, result = check_job(job)
+        job_running = not finished
+        if finished:
+            del st.session_state['job']
+            if result:
+                show_output(result, get_download_filename(job["filename"]))
+    except Exception as e:
+        st.error(f"Error: {e}")
+
+# The last output stays on the page across reruns, e.g. the one a click on its download button starts
+output = st.session_state.get('output')
+if output and output["run"] != st.session_state['run_number']:
+    render_output(output)
+
+# Conversion cache statistics (shared by everyone using this server)
+with st.sidebar.expander("Conversion Cache", expanded=False):
+    cache_stats = get_conversion_cache().get_stats()
+    st.metric("Hit rate", f"{cache_stats['hit_rate']:.0%}")
+    st.write(f"Hits: {cache_stats['memory_hits']} memory / {cache_stats['disk_hits']} disk, "
+             f"misses: {cache_stats['misses']}")
+    st.write(f"API time saved: {cache_stats['saved_seconds']:.1f}s")
+    st.write(f"Stored: {cache_stats['disk_entries']} conversions ({cache_stats['disk_bytes'] / 1024:.1f} KB)")
+
+# Per-key usage when requests are spread over a pool of API keys
+if not job_client and hasattr(get_backend(), "get_stats"):
+    with st.sidebar.expander("API Key Pool", expanded=False):
+        pool_stats = get_backend().get_stats()
+        st.metric("Requests per minute", f"{pool_stats['requests_per_minute']:.1f}",
+                  help=f"Capacity: {pool_stats['capacity_per_minute']} requests per minute")
+        for member in pool_stats["members"]:
+            status = "throttled" if member["throttled"] else "ok"
+            st.write(f"{member['label']}: {member['requests']} requests, {member['throttles']} throttled, "
+                     f"{member['last_minute_requests']} in the last minute ({status})")
+
+# Where pages went when simple pages are routed to a faster model
+if not job_client and hasattr(get_backend(), "get_routing_stats"):
+    with st.sidebar.expander("Model Routing", expanded=False):
+        routing_stats = get_backend().get_routing_stats()
+        st.caption(f"Pages with a complexity score of {routing_stats['threshold']:g} or more go to the strong model.")
+        for tier, tier_stats in routing_stats["tiers"].items():
+            st.write(f"{tier.capitalize()} ({tier_stats['model']}): {tier_stats['pages']} pages, "
+                     f"{tier_stats['average_model_seconds']:.1f}s average, {tier_stats['escalated']} escalated")
+
+# Script run timings: the first run in a process includes the imports, later reruns should be quick
+@st.cache_resource
+def get_process_timings():
+    return {"cold_start": None}
+
+process_timings = get_process_timings()
+run_seconds = time.perf_counter() - SCRIPT_STARTED
+if process_timings["cold_start"] is None:
+    process_timings["cold_start"] = run_seconds
+with st.sidebar.expander("Performance", expanded=False):
+    st.write(f"First run in this process: {process_timings['cold_start']:.2f}s")
+    st.write(f"This run: {run_seconds:.2f}s")
+    if st.session_state.get('spooled_upload'):
+        upload = st.session_state['spooled_upload'][1]
+        st.write(f"Uploaded PDF: {upload.size / 2**20:.1f} MB, {upload.memory_bytes / 2**20:.1f} MB of it held "
+                 f"in memory by this session (Streamlit keeps every upload in memory)")
+    page_budget = get_page_memory_budget()
+    st.write(f"Rendered pages in memory: {page_budget.used_bytes / 2**20:.0f} MB "
+             f"(peak {page_budget.peak_bytes / 2**20:.0f} MB of {page_budget.limit_bytes / 2**20:.0f} MB)")
+
+# Pipeline metrics of this server process (stage timings, tokens, retries), in the Prometheus text format
+if not job_client:
+    with st.sidebar.expander("Metrics", expanded=False):
+        st.caption("Per-stage timings, page outcomes, tokens and retries of every conversion on this server.")
+        st.download_button("Download metrics", render_prometheus(), "metrics.prom", mime="text/plain")
+
+# Footer
+st.markdown("---")
+st.markdown("""Made with 🧠 by [Sourabh Dey](https://linktr.ee/sourabhdey)""")
+st.markdown("Hindi to Hinglish Converter | Powered by Google Gemini API")
+
+# A running job is checked again by a timed rerun once the whole page has been drawn
+if job_running:
+    time.sleep(JOB_POLL_SECONDS)
+    st.rerun()
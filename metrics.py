@@ -0,0 +1,325 @@
+# Pipeline metrics
+# Stage timings, payload sizes, token counts, retries and cache hits of every converted page and document
+# go into process-wide counters and histograms. They are exported in the Prometheus text format (GET /metrics
+# on the job service, the app sidebar, --metrics-file in the CLI), and every page and document is also
+# logged as one JSON object on the "hinglish.metrics" logger.
+# An optional profiling hook (cProfile + tracemalloc) can be switched on for a single conversion.
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-page stats keys (seconds) that are timings of a pipeline stage
+STAGE_KEYS = {
+    "render": "render_seconds",
+    "prepare": "prepare_seconds",
+    "rate_limit_wait": "waited",
+    "model": "model_seconds",
+    "backoff": "backoff_seconds",
+    "circuit_breaker": "breaker_seconds",
+    "page": "elapsed",
+}
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+PROFILE_TOP_FUNCTIONS = 25
+
+METRIC_HELP = {
+    "hinglish_stage_seconds": ("histogram", "Time spent per pipeline stage"),
+    "hinglish_document_seconds": ("histogram", "Wall time per converted document"),
+    "hinglish_pages_total": ("counter", "Pages by source and outcome"),
+    "hinglish_documents_total": ("counter", "Converted documents"),
+    "hinglish_payload_bytes_total": ("counter", "Bytes uploaded to the model"),
+    "hinglish_tokens_total": ("counter", "Model tokens by kind (prompt, response)"),
+    "hinglish_retries_total": ("counter", "Retried model requests"),
+    "hinglish_hedged_requests_total": ("counter", "Duplicate (hedged) model requests"),
+    "hinglish_offline_fallbacks_total": ("counter", "Gemini pages transliterated offline instead, by reason"),
+    "hinglish_routed_pages_total": ("counter", "Pages by model routing tier and whether they were escalated"),
+    "hinglish_routed_model_seconds": ("histogram", "Model time per page by routing tier"),
+}
+
+metrics_logger = logging.getLogger("hinglish.metrics")
+logger = logging.getLogger(__name__)
+
+# tracemalloc is process wide while profiled blocks can overlap (two jobs, two sessions): the first block to
+# start turns tracing on and the last one to finish turns it off
+_profiling_lock = threading.Lock()
+_profiling_blocks = 0
+_profiling_started_tracing = False
+
+
+class Histogram:
+    """Cumulative bucket counts plus sum and count, as Prometheus expects them."""
+
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+# Function to format Prometheus labels, e.g. {stage="model"}
+def _format_labels(labels, **extra):
+    items = list(labels) + sorted(extra.items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, keyed by metric name and label values."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> Histogram
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    # Function to render every metric in the Prometheus text exposition format
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            names = sorted({name for name, _ in self.counters} | {name for name, _ in self.histograms})
+            for name in names:
+                kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+                for (metric, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{name}_bucket{_format_labels(labels, le=f'{bound:g}')} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, le='+Inf')} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+# Function to get the process-wide metrics registry
+def get_metrics():
+    return _registry
+
+
+# Function to render the pipeline metrics plus the conversion cache counters for a Prometheus scrape
+def render_prometheus():
+    from conversion_cache import get_conversion_cache  # opens the cache database, so only when scraped
+
+    cache = get_conversion_cache().get_stats()
+    lines = [
+        "# HELP hinglish_cache_lookups_total Conversion cache lookups by result",
+        "# TYPE hinglish_cache_lookups_total counter",
+        f'hinglish_cache_lookups_total{{result="memory_hit"}} {cache["memory_hits"]}',
+        f'hinglish_cache_lookups_total{{result="disk_hit"}} {cache["disk_hits"]}',
+        f'hinglish_cache_lookups_total{{result="miss"}} {cache["misses"]}',
+        "# HELP hinglish_cache_saved_seconds_total Model time saved by cache hits",
+        "# TYPE hinglish_cache_saved_seconds_total counter",
+        f"hinglish_cache_saved_seconds_total {cache['saved_seconds']:.3f}",
+    ]
+    return _registry.render_prometheus() + "\n".join(lines) + "\n"
+
+
+# Function to time a stage that is not part of a page (e.g. PDF export)
+@contextmanager
+def timed_stage(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registry.observe("hinglish_stage_seconds", time.perf_counter() - started, stage=stage)
+
+
+# Function to get how a page ended: converted, cached, blank, duplicate or failed
+def page_outcome(record):
+    stats = record.get("stats", {})
+    if stats.get("skipped"):
+        return stats["skipped"]
+    if record.get("error") or record.get("text") is None:
+        return "failed"
+    return "cached" if stats.get("cached") else "converted"
+
+
+# Function to add one page record to the metrics and log it as JSON
+def record_page(record, document=None):
+    stats = record.get("stats", {})
+    source = stats.get("source", "image")
+    outcome = page_outcome(record)
+    _registry.inc("hinglish_pages_total", source=source, outcome=outcome)
+    for stage, key in STAGE_KEYS.items():
+        if key in stats:
+            _registry.observe("hinglish_stage_seconds", stats[key], stage=stage)
+    if stats.get("payload_bytes"):
+        _registry.inc("hinglish_payload_bytes_total", stats["payload_bytes"])
+    for kind in ("prompt", "response"):
+        if stats.get(f"{kind}_tokens"):
+            _registry.inc("hinglish_tokens_total", stats[f"{kind}_tokens"], kind=kind)
+    if stats.get("retries"):
+        _registry.inc("hinglish_retries_total", stats["retries"])
+    if stats.get("hedged"):
+        _registry.inc("hinglish_hedged_requests_total", stats["hedged"])
+    if stats.get("offline_fallback"):
+        _registry.inc("hinglish_offline_fallbacks_total", reason=stats["offline_fallback"])
+    if stats.get("route"):
+        _registry.inc("hinglish_routed_pages_total", route=stats["route"], escalated=str(stats["escalated"]).lower())
+        if "model_seconds" in stats:
+            _registry.observe("hinglish_routed_model_seconds", stats["model_seconds"], route=stats["route"])
+
+    event = {"event": "page", "document": document, "page": record.get("page"), "source": source,
+             "outcome": outcome, "error": record.get("error"), "route": stats.get("route"), "model": stats.get("model"),
+             "backend": stats.get("backend"), "offline_fallback": stats.get("offline_fallback")}
+    event.update({key: value for key, value in stats.items() if isinstance(value, (int, float)) and key != "error"})
+    metrics_logger.info(json.dumps(event), extra={"event": event})
+
+
+# Function to add a finished document to the metrics and log its totals as JSON
+def record_document(records, seconds, document=None):
+    _registry.inc("hinglish_documents_total")
+    _registry.observe("hinglish_document_seconds", seconds)
+    outcomes = {}
+    for record in records:
+        outcome = page_outcome(record)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    event = {"event": "document", "document": document, "pages": len(records), "seconds": round(seconds, 3),
+             "outcomes": outcomes}
+    for key in ("payload_bytes", "prompt_tokens", "response_tokens", "retries", "waited", "model_seconds"):
+        event[key] = sum(record.get("stats", {}).get(key, 0) for record in records)
+    metrics_logger.info(json.dumps(event), extra={"event": event})
+    return event
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Formats every log line as one JSON object; metric events keep their fields at the top level."""
+
+    def format(self, record):
+        line = {"time": self.formatTime(record), "level": record.levelname, "logger": record.name}
+        event = getattr(record, "event", None)
+        if event is not None:
+            line.update(event)
+        else:
+            line["message"] = record.getMessage()
+        if record.exc_info:
+            line["exception"] = self.formatException(record.exc_info)
+        return json.dumps(line, ensure_ascii=False)
+
+
+# Function to profile a block of work, fills the yielded dict with a report once the block ends
+# cProfile sees the calling thread only (rendering, screening, waiting on pages); tracemalloc sees every
+# thread, so its peak includes anything else the process did at the same time. While other profiled blocks
+# run, the peak is the one since the earliest of them started ("overlapping" in the report).
+# Profiling never fails the block: its own errors are logged and kept in the report's "error"
+@contextmanager
+def profiled(enabled=True):
+    report = {}
+    if not enabled:
+        yield report
+        return
+
+    session = None
+    try:
+        session = _start_profiling()
+    except Exception as e:
+        logger.warning("Could not start profiling: %s", e)
+        report.update(_empty_profile(), error=str(e))
+    try:
+        yield report
+    finally:
+        if session is not None:
+            try:
+                report.update(_finish_profiling(session))
+            except Exception as e:
+                logger.warning("Could not finish profiling: %s", e)
+                report.update(_empty_profile(), error=str(e))
+
+
+def _empty_profile():
+    return {"profile": "", "tracemalloc_peak_mb": 0.0, "top_allocations": [], "overlapping": False}
+
+
+def _start_profiling():
+    global _profiling_blocks, _profiling_started_tracing
+    import cProfile
+    import tracemalloc
+
+    profiler = cProfile.Profile()
+    with _profiling_lock:
+        if _profiling_blocks == 0:
+            _profiling_started_tracing = not tracemalloc.is_tracing()
+            if _profiling_started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()  # only while no other block is measuring its own peak
+        _profiling_blocks += 1
+        session = {"profiler": profiler, "overlapping": _profiling_blocks > 1}
+    try:
+        session["profiler"].enable()
+    except Exception:
+        _release_tracing()
+        raise
+    return session
+
+
+def _finish_profiling(session):
+    import io
+    import pstats
+    import tracemalloc
+
+    try:
+        session["profiler"].disable()
+        with _profiling_lock:
+            _, peak = tracemalloc.get_traced_memory()
+            top_allocations = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            overlapping = session["overlapping"] or _profiling_blocks > 1
+    finally:
+        _release_tracing()
+    output = io.StringIO()
+    pstats.Stats(session["profiler"], stream=output).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return {
+        "profile": output.getvalue(),
+        "tracemalloc_peak_mb": peak / 2**20,
+        "top_allocations": [str(statistic) for statistic in top_allocations],
+        "overlapping": overlapping,
+    }
+
+
+# Function to end one profiled block's use of tracemalloc, the last one stops it (if profiling started it)
+def _release_tracing():
+    global _profiling_blocks
+    import tracemalloc
+
+    with _profiling_lock:
+        _profiling_blocks -= 1
+        if _profiling_blocks == 0 and _profiling_started_tracing:
+            tracemalloc.stop()
+
+
+# Function to turn a profiling report into text (for files and the job service)
+def format_profile(report):
+    notes = ""
+    if report.get("error"):
+        notes += f"Profiling failed: {report['error']}\n"
+    if report.get("overlapping"):
+        notes += "Other profiled conversions ran at the same time, the peak includes their memory\n"
+    return (notes + f"Peak traced memory: {report['tracemalloc_peak_mb']:.1f} MB\n\n"
+            + "Largest allocations still alive:\n" + "\n".join(report["top_allocations"]) + "\n\n" + report["profile"])
@@ -0,0 +1,168 @@
+# Model backends: the real Gemini client, and an in-process stand-in for offline load and latency tests
+# Every backend takes the same list of prompt parts (text, PIL images, {"mime_type", "data"} payloads)
+# and returns the response text, so the rest of the pipeline never knows which one it is talking to.
+# Pass a dict as `usage` to get the request's prompt_tokens and response_tokens back.
+# A backend can carry a system instruction (the fixed part of the prompt), which every request then gets
+# without sending it along.
+
+import random
+import re
+import threading
+import time
+
+
+DEFAULT_MODEL_NAME = 'gemini-2.0-flash'
+
+
+# Function to copy the token counts of a Gemini response into `usage`
+def read_usage(response, usage):
+    metadata = getattr(response, "usage_metadata", None)
+    if usage is None or metadata is None:
+        return
+    usage["prompt_tokens"] = metadata.prompt_token_count
+    usage["response_tokens"] = metadata.candidates_token_count
+
+
+class GeminiBackend:
+    def __init__(self, api_key=None, model_name=DEFAULT_MODEL_NAME, system_instruction=None):
+        import google.generativeai as genai  # slow to import, only loaded when Gemini is actually used
+
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        if api_key:
+            # genai.configure() is process wide, so each key gets its own client and several keys can be
+            # used side by side (see client_pool). The SDK has no public per-model key option: GenerativeModel
+            # (google-generativeai 0.3 and later) creates its client lazily in the private `_client`
+            # attribute, which is set here instead. An SDK without it fails loudly rather than letting the
+            # key configured last serve every backend.
+            if not hasattr(self.model, "_client"):
+                raise RuntimeError(f"google-generativeai {getattr(genai, '__version__', '?')} does not support "
+                                   f"per-key clients, install google-generativeai>=0.3")
+            from google.ai import generativelanguage
+
+            self.model._client = generativelanguage.GenerativeServiceClient(client_options={"api_key": api_key})
+
+    def generate(self, parts, usage=None):
+        response = self.model.generate_content(parts)
+        read_usage(response, usage)
+        return response.text
+
+    # Function to yield the response text chunk by chunk as Gemini produces it
+    # (the token counts arrive with the last chunk)
+    def generate_stream(self, parts, usage=None):
+        response = self.model.generate_content(parts, stream=True)
+        for chunk in response:
+            yield chunk.text
+        read_usage(response, usage)
+
+
+# Canned Hinglish used by the stub when no responses are given
+DEFAULT_STUB_RESPONSES = (
+    "Namaste, aap kaise hain? Yeh ek udaharan hai.",
+    "Sarkar ne aaj nayi yojana ki ghoshna ki. Iska laabh sabhi nagrikon ko milega.",
+    "Kripya dhyan dein: kal karyalay band rahega.",
+)
+
+BATCH_MARKER_PATTERN = re.compile(r"=== PAGE (\d+) ===")
+
+
+# Function to turn a latency spec like "fixed:0.5", "uniform:0.2,1.5", "normal:1,0.2" or "lognormal:0,0.5"
+# into a (distribution, parameters) pair for StubBackend
+def parse_latency_spec(spec):
+    name, _, params = spec.partition(":")
+    values = tuple(float(value) for value in params.split(",") if value)
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+    if name not in expected or len(values) != expected[name]:
+        raise ValueError(f"Invalid latency spec: {spec!r}")
+    return (name,) + values
+
+
+class StubBackend:
+    """Deterministic stand-in for Gemini: configurable latency, injected errors and canned responses."""
+
+    def __init__(self, latency=("fixed", 0.0), rate_limit_rate=0.0, server_error_rate=0.0, timeout_rate=0.0,
+                 responses=DEFAULT_STUB_RESPONSES, seed=0, model_name="stub", system_instruction=None):
+        self.latency = parse_latency_spec(latency) if isinstance(latency, str) else tuple(latency)
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.timeout_rate = timeout_rate
+        self.responses = responses
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats = {"calls": 0, "rate_limited": 0, "server_errors": 0, "timeouts": 0, "max_in_flight": 0}
+
+    def _sample_latency(self):
+        name, *params = self.latency
+        if name == "fixed":
+            return params[0]
+        if name == "uniform":
+            return self.random.uniform(*params)
+        if name == "normal":
+            return max(0.0, self.random.gauss(*params))
+        return self.random.lognormvariate(*params)
+
+    # Function to build the response, mirroring page markers so batched requests can be split
+    def _respond(self, parts, call_number):
+        if callable(self.responses):
+            return self.responses(parts)
+        texts = [part for part in parts if isinstance(part, str)]
+        markers = [int(number) for text in texts for number in BATCH_MARKER_PATTERN.findall(text)]
+        if len(markers) > 1:
+            return "\n".join(
+                f"=== PAGE {number} ===\n{self.responses[(call_number + number) % len(self.responses)]}"
+                for number in sorted(set(markers))
+            )
+        return self.responses[call_number % len(self.responses)]
+
+    def generate(self, parts, usage=None):
+        # Draw everything random under the lock so a given seed always gives the same sequence
+        with self.lock:
+            self.stats["calls"] += 1
+            call_number = self.stats["calls"]
+            self.in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.in_flight)
+            latency = self._sample_latency()
+            roll = self.random.random()
+        try:
+            time.sleep(latency)
+            if roll < self.rate_limit_rate + self.server_error_rate + self.timeout_rate:
+                from google.api_core import exceptions as google_exceptions
+            if roll < self.rate_limit_rate:
+                with self.lock:
+                    self.stats["rate_limited"] += 1
+                raise google_exceptions.ResourceExhausted("429 Resource has been exhausted (stub)")
+            roll -= self.rate_limit_rate
+            if roll < self.server_error_rate:
+                with self.lock:
+                    self.stats["server_errors"] += 1
+                raise google_exceptions.ServiceUnavailable("503 The service is currently unavailable (stub)")
+            roll -= self.server_error_rate
+            if roll < self.timeout_rate:
+                with self.lock:
+                    self.stats["timeouts"] += 1
+                raise google_exceptions.DeadlineExceeded("504 Deadline exceeded (stub)")
+            text = self._respond(parts, call_number)
+            if usage is not None:
+                # Rough counts: four characters per token, one 258 token tile per image; like Gemini, the
+                # system instruction counts towards the prompt tokens of every request
+                usage["prompt_tokens"] = (len(self.system_instruction or "") // 4
+                                          + sum(len(part) // 4 if isinstance(part, str) else 258 for part in parts))
+                usage["response_tokens"] = len(text) // 4
+            return text
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    # Function to yield the response a few words at a time, the sampled latency is spent before the first chunk
+    def generate_stream(self, parts, words_per_chunk=4, usage=None):
+        words = re.split(r"(?<=\s)", self.generate(parts, usage))
+        for start in range(0, len(words), words_per_chunk):
+            yield "".join(words[start:start + words_per_chunk])
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats)
@@ -0,0 +1,147 @@
+# Model routing per page
+# Pages differ a lot: a notice with three lines does not need the model a dense newspaper column needs.
+# Every page gets a complexity score from cheap signals (how much of a scanned page is ink, how large it
+# was rendered, how long a text layer is) and goes to the fast model below the threshold and to the strong
+# model above it. An answer of the fast model that looks unconfident (empty, Devanagari left in it, much
+# shorter than the text it converts) is converted again by the strong model. Each decision goes into the
+# page stats, so the metrics JSON logs show it next to the latency it got and the threshold can be tuned.
+
+import os
+import re
+import threading
+
+from rate_limiting import DEFAULT_REQUESTS_PER_MINUTE
+
+FAST = "fast"
+STRONG = "strong"
+
+ROUTE_THRESHOLD = float(os.environ.get("GEMINI_ROUTING_THRESHOLD", 0.5))
+
+# Complexity signals, each scaled so that 1.0 is a page the fast model should not be trusted with
+DENSE_INK_RATIO = 0.2  # share of a scanned page's thumbnail that is ink, a full page of body text
+SMALL_PRINT_MEGAPIXELS = 6.0  # small print is rendered at a high DPI (see choose_render_dpi)
+SMALL_PRINT_BONUS = 0.25
+DENSE_TEXT_CHARS = 2000  # characters of a text layer
+
+# Unconfident answers: too much Devanagari left, or much shorter than the Hindi text it came from
+MAX_DEVANAGARI_SHARE = 0.2
+MIN_TEXT_LENGTH_RATIO = 0.5
+DEVANAGARI_PATTERN = re.compile(r"[\u0900-\u097F]")
+LETTER_PATTERN = re.compile(r"[^\W\d_]")
+
+
+# Function to collect the cheap complexity signals of a page (PIL image or text)
+# Page screening leaves the ink ratio in image.info, so screened pages are not measured twice
+def page_signals(content):
+    if isinstance(content, str):
+        return {"text_chars": len(content.strip())}
+
+    ink_ratio = content.info.get("ink_ratio")
+    if ink_ratio is None:
+        from page_screening import page_thumbnail, ink_mask
+
+        ink_ratio = float(ink_mask(page_thumbnail(content)).mean())
+    return {"ink_ratio": ink_ratio, "megapixels": content.width * content.height / 1e6}
+
+
+# Function to turn the signals of a page into a complexity score between 0 and 1
+def complexity_score(signals):
+    if "text_chars" in signals:
+        return min(1.0, signals["text_chars"] / DENSE_TEXT_CHARS)
+    score = signals["ink_ratio"] / DENSE_INK_RATIO
+    if signals["megapixels"] > SMALL_PRINT_MEGAPIXELS:
+        score += SMALL_PRINT_BONUS
+    return min(1.0, score)
+
+
+# Function to check whether a conversion looks like the model struggled with the page
+def looks_unconfident(result, signals):
+    if not result:
+        return True
+    letters = len(LETTER_PATTERN.findall(result))
+    if letters and len(DEVANAGARI_PATTERN.findall(result)) / letters > MAX_DEVANAGARI_SHARE:
+        return True
+    return "text_chars" in signals and len(result) < MIN_TEXT_LENGTH_RATIO * signals["text_chars"]
+
+
+# Function to add up the stats of two model calls for the same page (times, tokens, retries)
+def merge_call_stats(first, second):
+    merged = dict(first)
+    for key, value in second.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and key in merged:
+            merged[key] = merged[key] + value
+        else:
+            merged[key] = value
+    return merged
+
+
+class ModelRouter:
+    """Model backend that sends each page to a fast or a strong model by its estimated complexity."""
+
+    def __init__(self, fast, strong, threshold=ROUTE_THRESHOLD, escalate=True):
+        self.tiers = {FAST: fast, STRONG: strong}
+        self.threshold = threshold
+        self.escalate = escalate
+        # Part of the conversion cache key, so routed results never mix with single-model results
+        self.model_name = f"route:{fast.model_name}|{strong.model_name}@{threshold:g}"
+        # One rate limit paces both tiers and any page can go to either, so it must fit the tier with the least quota
+        self.requests_per_minute = min(getattr(backend, "requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE)
+                                       for backend in self.tiers.values())
+        self.lock = threading.Lock()
+        # Streamed and batched pages are routed without a model time of their own, timed_pages counts the others
+        self.stats = {tier: {"pages": 0, "escalated": 0, "timed_pages": 0, "model_seconds": 0.0} for tier in self.tiers}
+
+    # Function to choose the tier of a page, returns (tier, score, signals)
+    def route(self, content):
+        signals = page_signals(content)
+        score = complexity_score(signals)
+        return (STRONG if score >= self.threshold else FAST), score, signals
+
+    # Function to convert one page on its tier, `call(backend, stats)` makes the model call and returns the text
+    # Unconfident answers of the fast model are converted again on the strong model. That is a request of its
+    # own, so `before_escalate` runs first (e.g. to take another rate limit token)
+    def convert(self, content, call, stats=None, before_escalate=None):
+        tier, score, signals = self.route(content)
+        call_stats = {}
+        result = call(self.tiers[tier], call_stats)
+        escalated = self.escalate and tier == FAST and looks_unconfident(result, signals)
+        if escalated:
+            if before_escalate:
+                before_escalate()
+            strong_stats = {}
+            result = call(self.tiers[STRONG], strong_stats)
+            call_stats = merge_call_stats(call_stats, strong_stats)
+        self._record(tier, score, signals, call_stats, escalated, stats)
+        return result
+
+    # Function to pick the backend for a streamed page, streams are shown as they arrive so they are never escalated
+    def backend_for(self, content, stats=None):
+        tier, score, signals = self.route(content)
+        self._record(tier, score, signals, {}, False, stats)
+        return self.tiers[tier]
+
+    def _record(self, tier, score, signals, call_stats, escalated, stats):
+        with self.lock:
+            self.stats[tier]["pages"] += 1
+            self.stats[tier]["escalated"] += escalated
+            if "model_seconds" in call_stats:
+                self.stats[tier]["timed_pages"] += 1
+                self.stats[tier]["model_seconds"] += call_stats["model_seconds"]
+        if stats is not None:
+            stats.update(call_stats, route=tier, model=self.tiers[STRONG if escalated else tier].model_name,
+                         complexity=round(score, 3), escalated=escalated,
+                         **{key: round(value, 4) for key, value in signals.items()})
+
+    # Requests that come without a page to judge go to the strong model
+    def generate(self, parts, usage=None):
+        return self.tiers[STRONG].generate(parts, usage=usage)
+
+    def generate_stream(self, parts, usage=None):
+        return self.tiers[STRONG].generate_stream(parts, usage=usage)
+
+    def get_routing_stats(self):
+        with self.lock:
+            tiers = {tier: dict(stats, model=self.tiers[tier].model_name) for tier, stats in self.stats.items()}
+        for stats in tiers.values():
+            stats["average_model_seconds"] = stats["model_seconds"] / stats["timed_pages"] if stats["timed_pages"] else 0.0
+        return {"threshold": self.threshold, "tiers": tiers}
@@ -0,0 +1,135 @@
+# Page screening before conversion
+# Scanned documents are full of blank separator pages, repeated cover sheets and identical letterheads.
+# Every rendered page is shrunk to a small grayscale thumbnail: pages without ink are skipped, and pages
+# whose perceptual hash and ink pattern match an earlier page reuse that page's result instead of being
+# sent to the API again.
+
+import hashlib
+from functools import lru_cache
+
+# Thumbnail every check works on, about 150 KB of pixels instead of the full render
+THUMBNAIL_WIDTH = 320
+
+# Blank pages: almost no pixels clearly darker than the paper, or hardly any variation at all
+INK_CONTRAST = 48  # gray levels below the paper color that count as ink
+BLANK_MAX_INK_RATIO = 0.002
+BLANK_MAX_STD = 2.0
+
+# Duplicates: the hash finds candidates, comparing the ink of both pages confirms them. Two form letters
+# that differ only in a name hash alike, so a repeat has to match almost pixel for pixel; a page that
+# was scanned twice usually does not, and simply gets converted again.
+HASH_SIZE = 64  # the page is shrunk to HASH_SIZE x HASH_SIZE before the DCT
+HASH_BITS_SIDE = 16  # lowest 16 x 16 frequencies -> 256 bit hash
+DUPLICATE_MAX_HASH_DISTANCE = 10
+DUPLICATE_MAX_INK_DIFFERENCE = 0.001  # differing ink pixels, as a fraction of the page's ink pixels
+
+BLANK = "blank"
+DUPLICATE = "duplicate"
+
+
+# Function to shrink a page image to a grayscale NumPy thumbnail of THUMBNAIL_WIDTH pixels wide
+def page_thumbnail(image):
+    import numpy as np
+    from PIL import Image
+
+    height = max(1, round(image.height * THUMBNAIL_WIDTH / image.width))
+    # Box filter on the full image first, so the grayscale conversion only touches the thumbnail
+    with image.resize((THUMBNAIL_WIDTH, height), Image.BOX) as small, small.convert("L") as gray:
+        return np.asarray(gray, dtype=np.uint8)
+
+
+# Function to find the ink in a thumbnail: pixels clearly darker than the paper (boolean array)
+def ink_mask(pixels):
+    import numpy as np
+
+    return pixels < np.percentile(pixels, 90) - INK_CONTRAST
+
+
+# Function to check whether a thumbnail is an empty page (paper, scanner noise, maybe a page number)
+def is_blank(pixels, ink):
+    return pixels.std() < BLANK_MAX_STD or ink.mean() < BLANK_MAX_INK_RATIO
+
+
+@lru_cache(maxsize=None)
+def _dct_matrix(size):
+    import numpy as np
+
+    rows = np.arange(size)[:, None]
+    cols = np.arange(size)[None, :]
+    return np.cos(np.pi * (2 * cols + 1) * rows / (2 * size))
+
+
+# Function to compute a 256 bit perceptual hash (DCT based) of a thumbnail, returned as an int
+def perceptual_hash(pixels):
+    import numpy as np
+    from PIL import Image
+
+    small = Image.fromarray(pixels).resize((HASH_SIZE, HASH_SIZE), Image.BOX)
+    matrix = _dct_matrix(HASH_SIZE)
+    frequencies = matrix @ np.asarray(small, dtype=np.float64) @ matrix.T
+    low = frequencies[:HASH_BITS_SIDE, :HASH_BITS_SIDE].flatten()
+    bits = low > np.median(low[1:])  # the DC term only says how dark the page is
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+# Function to count the differing bits of two hashes
+def hash_distance(first, second):
+    return bin(first ^ second).count("1")
+
+
+# Function to check whether two pages have the same ink, given as (shape, ink pixel count, packed mask)
+def same_ink(first, second):
+    import numpy as np
+
+    (shape, ink_pixels, packed), (other_shape, _, other_packed) = first, second
+    if shape != other_shape:
+        return False
+    different = int(np.unpackbits(packed ^ other_packed).sum())
+    return different <= DUPLICATE_MAX_INK_DIFFERENCE * ink_pixels
+
+
+class PageScreener:
+    """Remembers the pages of one document and spots blank pages and repeats of earlier pages."""
+
+    def __init__(self, max_hash_distance=DUPLICATE_MAX_HASH_DISTANCE):
+        self.max_hash_distance = max_hash_distance
+        self.images = []  # (hash, ink, page number) of every distinct rendered page, ink packed to bits
+        self.texts = {}  # digest of an extracted text layer -> page number
+
+    # Function to screen one page (rendered image or extracted text)
+    # Returns (BLANK, None), (DUPLICATE, earlier page number) or (None, None) for a page to convert
+    def screen(self, page_num, content):
+        if isinstance(content, str):
+            digest = hashlib.sha256(" ".join(content.split()).encode("utf-8")).digest()
+            original = self.texts.setdefault(digest, page_num)
+            return (DUPLICATE, original) if original != page_num else (None, None)
+
+        import numpy as np
+
+        pixels = page_thumbnail(content)
+        ink = ink_mask(pixels)
+        content.info["ink_ratio"] = float(ink.mean())  # model routing reads it instead of measuring again
+        if is_blank(pixels, ink):
+            return BLANK, None
+        page_hash = perceptual_hash(pixels)
+        page_ink = (ink.shape, int(ink.sum()), np.packbits(ink))
+        for other_hash, other_ink, other_page in self.images:
+            if hash_distance(page_hash, other_hash) <= self.max_hash_distance and same_ink(page_ink, other_ink):
+                return DUPLICATE, other_page
+        self.images.append((page_hash, page_ink, page_num))
+        return None, None
+
+
+# Function to total up what screening saved on a document from its page records
+# API time saved is estimated from the average time of the pages that were actually converted
+def screening_summary(records):
+    skipped = [record for record in records if record["stats"].get("skipped")]
+    converted = [record["stats"]["elapsed"] for record in records
+                 if not record["stats"].get("skipped") and "elapsed" in record["stats"]]
+    average = sum(converted) / len(converted) if converted else 0.0
+    return {
+        "blank_pages": sum(record["stats"]["skipped"] == BLANK for record in skipped),
+        "duplicate_pages": sum(record["stats"]["skipped"] == DUPLICATE for record in skipped),
+        "skipped_calls": len(skipped),
+        "saved_seconds": len(skipped) * average,
+    }
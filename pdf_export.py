@@ -0,0 +1,157 @@
+# PDF export of the converted Hinglish text
+# Wraps the whole text once with cached glyph widths and writes each page's content stream directly, in one
+# embedded Unicode font (loaded once per process, subset to the glyphs actually used), then saves the
+# document straight to bytes or a file handle.
+
+import logging
+import os
+import threading
+from functools import lru_cache
+
+from metrics import timed_stage
+
+logger = logging.getLogger(__name__)
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+PAGE_MARGIN = 50
+FONT_SIZE = 11
+LINE_HEIGHT = 1.3  # multiple of the font size
+FONT_RESOURCE = "hinglish"  # name of the embedded font in the page resources
+
+# Unicode TTF used when HINGLISH_PDF_FONT is not set, the first one that exists wins
+FONT_CANDIDATES = (
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf",
+    "/usr/share/fonts/noto/NotoSans-Regular.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+    "C:\\Windows\\Fonts\\arial.ttf",
+)
+
+# PyMuPDF documents must not be shared between threads, and Streamlit runs every session in its own thread
+_export_lock = threading.Lock()
+
+
+# Function to load the export font once per process
+# Order: HINGLISH_PDF_FONT, Noto Sans from the pymupdf-fonts package, a system font, built-in Helvetica
+@lru_cache(maxsize=1)
+def get_export_font():
+    import fitz  # PyMuPDF
+
+    font_file = os.environ.get("HINGLISH_PDF_FONT")
+    if font_file:
+        return fitz.Font(fontfile=font_file)
+    try:
+        return fitz.Font("notos")
+    except Exception:
+        pass
+    for candidate in FONT_CANDIDATES:
+        if os.path.exists(candidate):
+            return fitz.Font(fontfile=candidate)
+    logger.warning("No Unicode font found, PDF export falls back to Helvetica (set HINGLISH_PDF_FONT)")
+    return fitz.Font("helv")
+
+
+# Function to get a character's advance width (in units of the font size), measured once per character
+@lru_cache(maxsize=None)
+def _char_width(char):
+    return get_export_font().glyph_advance(ord(char))
+
+
+# Function to get a word's width, words repeat a lot in running text so they are cached too
+@lru_cache(maxsize=65536)
+def _word_width(word):
+    return sum(_char_width(char) for char in word)
+
+
+# Function to get a character's glyph id as the 4 hex digits an Identity-H font expects, looked up once
+@lru_cache(maxsize=None)
+def _glyph_hex(char):
+    return f"{get_export_font().has_glyph(ord(char)):04x}"
+
+
+# Function to wrap one line of text to a width (in units of the font size) at spaces,
+# words longer than a whole line are broken between characters
+def wrap_line(line, width):
+    wrapped = []
+    current, current_width = "", 0.0
+    space_width = _char_width(" ")
+    for word in line.split(" "):
+        word_width = _word_width(word)
+        if current and current_width + space_width + word_width > width:
+            wrapped.append(current)
+            current, current_width = "", 0.0
+        if not current and word_width > width:
+            for char in word:
+                if current and current_width + _char_width(char) > width:
+                    wrapped.append(current)
+                    current, current_width = "", 0.0
+                current += char
+                current_width += _char_width(char)
+            continue
+        if current:
+            current += " "
+            current_width += space_width
+        current += word
+        current_width += word_width
+    wrapped.append(current)
+    return wrapped
+
+
+# Function to write the content stream for one page of lines: one text object, one Tj per line
+def _page_content(lines, font_size):
+    top = PAGE_HEIGHT - PAGE_MARGIN - font_size
+    body = "> Tj T*\n<".join("".join(map(_glyph_hex, line)) for line in lines)
+    return (f"BT\n/{FONT_RESOURCE} {font_size} Tf\n{font_size * LINE_HEIGHT:g} TL\n"
+            f"1 0 0 1 {PAGE_MARGIN} {top:g} Tm\n<{body}> Tj\nET\n").encode("ascii")
+
+
+# Function to build the PDF document: wrap everything once, then write each page's content stream directly
+def _build_document(text, font_size):
+    import fitz  # PyMuPDF
+
+    text_width = (PAGE_WIDTH - 2 * PAGE_MARGIN) / font_size
+    lines_per_page = int((PAGE_HEIGHT - 2 * PAGE_MARGIN) / (font_size * LINE_HEIGHT))
+    lines = [wrapped for line in text.split("\n") for wrapped in wrap_line(line, text_width)]
+
+    doc = fitz.open()
+    resources = None
+    for start in range(0, max(len(lines), 1), lines_per_page):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        page_lines = lines[start:start + lines_per_page]
+        if not any(page_lines):
+            continue
+        # The font is embedded with the first page, later pages share that page's resources
+        if resources:
+            doc.xref_set_key(page.xref, "Resources", resources)
+        else:
+            page.insert_font(fontname=FONT_RESOURCE, fontbuffer=get_export_font().buffer)
+            resources = doc.xref_get_key(page.xref, "Resources")[1]
+        content_xref = doc.get_new_xref()
+        doc.update_object(content_xref, "<<>>")
+        doc.update_stream(content_xref, _page_content(page_lines, font_size))
+        doc.xref_set_key(page.xref, "Contents", f"{content_xref} 0 R")
+    try:
+        doc.subset_fonts()
+    except Exception as e:
+        logger.warning("Font subsetting failed, embedding the full font: %s", e)
+    return doc
+
+
+# Function to write the text as a PDF to a path or a binary file handle
+def write_pdf(text, output, font_size=FONT_SIZE):
+    with _export_lock, timed_stage("pdf_export"):
+        doc = _build_document(text, font_size)
+        try:
+            doc.save(output, garbage=3, deflate=True)
+        finally:
+            doc.close()
+
+
+# Function to render the text as PDF bytes, e.g. for st.download_button
+def render_pdf(text, font_size=FONT_SIZE):
+    with _export_lock, timed_stage("pdf_export"):
+        doc = _build_document(text, font_size)
+        try:
+            return doc.tobytes(garbage=3, deflate=True)
+        finally:
+            doc.close()
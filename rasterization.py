@@ -0,0 +1,88 @@
+# Parallel page rendering for long PDFs
+# Rendering scanned pages is CPU bound and PyMuPDF objects cannot be shared between threads, so long
+# documents are rendered by a pool of processes: every worker opens its own copy of the document from
+# the same bytes (or path) once, renders the page ranges it is given and sends the pages back, and the
+# caller gets them in document order while the workers are already rendering the next ranges.
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+# Worker processes used for one document (HINGLISH_RENDER_PROCESSES=1 turns parallel rendering off)
+RENDER_PROCESSES = int(os.environ.get("HINGLISH_RENDER_PROCESSES", 0)) or min(os.cpu_count() or 1, 8)
+# Starting the workers costs a few hundred milliseconds, short documents are rendered in this process
+PARALLEL_MIN_PAGES = 24
+PAGES_PER_TASK = 2
+# Render processes of all documents converted at once (sessions, job workers) share this many slots, so
+# concurrent conversions never start more render processes than there are cores (HINGLISH_MAX_RENDER_PROCESSES)
+MAX_RENDER_PROCESSES = int(os.environ.get("HINGLISH_MAX_RENDER_PROCESSES", 0)) or os.cpu_count() or 1
+_render_slots = threading.BoundedSemaphore(MAX_RENDER_PROCESSES)
+
+_worker_document = None  # the document opened by this worker process
+
+
+# Function to get what a worker needs to open its own copy of an open document: its path or its bytes
+# Returns None for documents built in memory, which can only be rendered in this process
+def document_source(doc):
+    if doc.name and os.path.exists(doc.name):
+        return doc.name
+    return getattr(doc, "stream", None)
+
+
+def _open_worker_document(source):
+    global _worker_document
+    import fitz  # PyMuPDF
+
+    if isinstance(source, str):
+        _worker_document = fitz.open(source)
+    else:
+        _worker_document = fitz.open(stream=source, filetype="pdf")
+
+
+def _render_pages(page_nums):
+    from doc_file_processing import render_pdf_page  # doc_file_processing imports this module, import it late
+
+    return [(page_num + 1, render_pdf_page(_worker_document, page_num)) for page_num in page_nums]
+
+
+# Function to reserve up to `wanted` render processes from the process-wide slots without waiting, yields the
+# number reserved (0 when every slot is taken) and frees them when the block ends
+@contextmanager
+def render_process_slots(wanted):
+    reserved = 0
+    while reserved < wanted and _render_slots.acquire(blocking=False):
+        reserved += 1
+    try:
+        yield reserved
+    finally:
+        for _ in range(reserved):
+            _render_slots.release()
+
+
+# Function to render pages (0-based numbers) on a pool of processes, yields (page number, content) in order
+# Callers reserve the processes first with render_process_slots
+# Only one range per worker is rendered ahead of the caller, so a slow consumer holds back the workers
+# Pages rendered ahead are not charged against the page memory budget until the caller takes them, which
+# bounds them at `processes` * PAGES_PER_TASK pages instead
+def render_pages_parallel(source, page_nums, processes=RENDER_PROCESSES):
+    tasks = iter([page_nums[start:start + PAGES_PER_TASK] for start in range(0, len(page_nums), PAGES_PER_TASK)])
+    # "spawn" starts clean workers, forking a process that runs threads (Streamlit, our worker pools) is unsafe
+    pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_open_worker_document, initargs=(source,))
+    pending = deque()
+    try:
+        for task in tasks:
+            pending.append(pool.submit(_render_pages, task))
+            if len(pending) >= processes:
+                break
+        while pending:
+            pages = pending.popleft().result()
+            task = next(tasks, None)
+            if task:
+                pending.append(pool.submit(_render_pages, task))
+            yield from pages
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
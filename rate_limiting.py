@@ -0,0 +1,108 @@
+# Rate limiting helpers shared by the page converters
+
+import os
+import threading
+import time
+
+DEFAULT_REQUESTS_PER_MINUTE = 15  # per Gemini key and model, unless configured otherwise
+
+
+# Token bucket used to keep Gemini calls inside a requests-per-minute budget
+class TokenBucket:
+    """Blocking token bucket: `rate_per_minute` tokens refill evenly, up to `burst`."""
+
+    def __init__(self, rate_per_minute, burst=1):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.updated_at = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_second)
+
+    # Take one token without waiting, returns True if one was available
+    def try_acquire(self):
+        with self.lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    # Wait until a token is available and take it, returns the seconds spent waiting
+    def acquire(self):
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait_for = (1 - self.tokens) / self.rate_per_second
+            time.sleep(wait_for)
+            waited += wait_for
+
+
+# Memory budget used to bound the rendered pages held at once, across every conversion in the process
+class MemoryBudget:
+    """Blocking byte budget: `acquire` waits until `nbytes` fit under `limit_bytes`, `release` gives them back."""
+
+    def __init__(self, limit_bytes):
+        if limit_bytes <= 0:
+            raise ValueError("limit_bytes must be positive")
+        self.limit_bytes = limit_bytes
+        self.used_bytes = 0
+        self.peak_bytes = 0
+        self.condition = threading.Condition()
+
+    # A request is always granted when nothing is held, so a page larger than the budget cannot block forever
+    def _fits(self, nbytes):
+        return self.used_bytes == 0 or self.used_bytes + nbytes <= self.limit_bytes
+
+    def _take(self, nbytes):
+        self.used_bytes += nbytes
+        self.peak_bytes = max(self.peak_bytes, self.used_bytes)
+
+    # Take `nbytes` without waiting, returns True if they fit
+    def try_acquire(self, nbytes):
+        with self.condition:
+            if self._fits(nbytes):
+                self._take(nbytes)
+                return True
+            return False
+
+    # Wait until `nbytes` fit and take them, returns the seconds spent waiting
+    def acquire(self, nbytes):
+        started = time.monotonic()
+        with self.condition:
+            self.condition.wait_for(lambda: self._fits(nbytes))
+            self._take(nbytes)
+        return time.monotonic() - started
+
+    def release(self, nbytes):
+        with self.condition:
+            self.used_bytes = max(0, self.used_bytes - nbytes)
+            self.condition.notify_all()
+
+
+# Rendered pages waiting for or under conversion may use this much memory (HINGLISH_PAGE_MEMORY_MB)
+DEFAULT_PAGE_MEMORY_MB = 512
+
+_shared_page_budget = None
+_shared_page_budget_lock = threading.Lock()
+
+
+# Function to get the process-wide page memory budget shared by every conversion and Streamlit session
+def get_page_memory_budget():
+    global _shared_page_budget
+    with _shared_page_budget_lock:
+        if _shared_page_budget is None:
+            megabytes = int(os.environ.get("HINGLISH_PAGE_MEMORY_MB", DEFAULT_PAGE_MEMORY_MB))
+            _shared_page_budget = MemoryBudget(megabytes * 1024 * 1024)
+        return _shared_page_budget
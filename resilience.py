@@ -0,0 +1,217 @@
+# Resilience around model calls: error classification, retries with jittered exponential backoff,
+# a circuit breaker shared by all workers, and optional hedged (duplicate) requests for slow pages.
+# Retry counts and time spent waiting are written into the per-page stats dict.
+
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Error kinds
+RATE_LIMIT = "rate_limit"
+SERVER_ERROR = "server_error"
+TIMEOUT = "timeout"
+SAFETY_BLOCK = "safety_block"
+OTHER = "other"
+
+RETRYABLE = (RATE_LIMIT, SERVER_ERROR, TIMEOUT)
+
+# "retry_delay { seconds: 27 }" in Gemini quota errors, "Please retry in 27.5s" in newer messages
+RETRY_DELAY_PATTERNS = (
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+(?:\.\d+)?)"),
+    re.compile(r"retry in (\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+)
+SAFETY_EXCEPTIONS = ("BlockedPromptException", "StopCandidateException")
+
+
+# Function to sort an exception from a model call into one of the error kinds above
+# google.api_core errors carry the HTTP status in `code`, so no Google import is needed here
+def classify_error(error):
+    code = getattr(error, "code", None)
+    code = code if isinstance(code, int) else None
+    message = str(error).lower()
+    if type(error).__name__ in SAFETY_EXCEPTIONS or "safety" in message or "blocked" in message:
+        return SAFETY_BLOCK
+    if code == 429 or "429" in message or "quota" in message:
+        return RATE_LIMIT
+    if isinstance(error, TimeoutError) or code == 504 or "deadline" in message or "timed out" in message:
+        return TIMEOUT
+    if (code is not None and 500 <= code < 600) or re.match(r"5\d\d ", message):
+        return SERVER_ERROR
+    return OTHER
+
+
+# Function to read the wait the server asked for, returns seconds or None
+def server_retry_delay(error):
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after:
+        return float(retry_after)
+    message = str(error)
+    for pattern in RETRY_DELAY_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class CircuitBreaker:
+    """Pauses every worker while the API quota is exhausted, instead of each one hammering it with 429s."""
+
+    def __init__(self, default_pause=30.0):
+        self.default_pause = default_pause
+        self.open_until = 0.0
+        self.trips = 0
+        self.lock = threading.Lock()
+
+    def trip(self, seconds=None):
+        with self.lock:
+            self.open_until = max(self.open_until, time.monotonic() + (seconds or self.default_pause))
+            self.trips += 1
+
+    def is_open(self):
+        return time.monotonic() < self.open_until
+
+    # Function to block until the breaker closes, returns the seconds waited
+    def wait(self):
+        waited = 0.0
+        while True:
+            with self.lock:
+                remaining = self.open_until - time.monotonic()
+            if remaining <= 0:
+                return waited
+            time.sleep(remaining)
+            waited += remaining
+
+
+class RetryPolicy:
+    """How often and how patiently a model call is retried, and when a slow call gets a duplicate."""
+
+    def __init__(self, max_attempts=4, base_delay=2.0, max_delay=60.0, hedge_after=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after  # seconds, None disables hedged requests
+
+    # Function to pick the wait before the next attempt: the server's delay when it gave one,
+    # otherwise exponential backoff with full jitter so workers do not retry in lockstep
+    def backoff(self, attempt, error):
+        requested = server_retry_delay(error)
+        if requested is not None:
+            return min(self.max_delay, requested) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+# Hedged duplicates run on their own small pool so they never queue behind the page workers
+# (the first request of every call runs in the caller's thread and never takes a slot here)
+_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+def _new_stats(stats):
+    stats = stats if stats is not None else {}
+    for key in ("attempts", "retries", "hedged"):
+        stats.setdefault(key, 0)
+    for key in ("backoff_seconds", "breaker_seconds"):
+        stats.setdefault(key, 0.0)
+    stats.setdefault("errors", [])
+    return stats
+
+
+# Function to run a call in this thread, sending a duplicate to the hedge pool if it is still running after
+# `hedge_after` seconds. The duplicate is a request of its own, so `before_retry` (the rate limit) runs first.
+# This thread's answer is used when it succeeds, the duplicate's when it fails; an error only counts once
+# both copies have failed
+def _call_hedged(call, hedge_after, stats, before_retry=None):
+    lock = threading.Lock()
+    hedge = {"done": False, "future": None}
+
+    def send_duplicate():
+        # The primary may have answered while the timer fired, then the duplicate must not take a token
+        with lock:
+            if hedge["done"]:
+                return
+        if before_retry:
+            before_retry()
+        with lock:
+            if not hedge["done"]:
+                hedge["future"] = _hedge_executor.submit(call)
+                stats["hedged"] += 1
+
+    timer = threading.Timer(hedge_after, send_duplicate)
+    timer.daemon = True
+    timer.start()
+    try:
+        return call()
+    except Exception as e:
+        with lock:
+            hedge["done"] = True
+            duplicate = hedge["future"]
+        if duplicate is None:
+            raise
+        try:
+            return duplicate.result()
+        except Exception:
+            raise e from None
+    finally:
+        timer.cancel()
+        with lock:
+            hedge["done"] = True
+
+
+# Function to wait out the breaker and the backoff after a failed attempt, raises when it should not retry
+def _handle_failure(error, attempt, policy, breaker, stats, retry_kinds):
+    kind = classify_error(error)
+    stats["errors"].append(kind)
+    delay = policy.backoff(attempt, error)
+    if kind == RATE_LIMIT and breaker is not None:
+        # Quota problems are shared by every worker, so everyone waits (the breaker wait is counted
+        # at the start of the next attempt)
+        breaker.trip(delay)
+    if kind not in retry_kinds or attempt + 1 >= policy.max_attempts:
+        raise error
+    if not (kind == RATE_LIMIT and breaker is not None):
+        time.sleep(delay)
+        stats["backoff_seconds"] += delay
+    stats["retries"] += 1
+
+
+# Function to call the model with retries, backoff, the shared circuit breaker and optional hedging
+# `before_retry` runs before every attempt after the first (e.g. to take another rate limit token)
+def call_with_retries(call, policy=None, breaker=None, stats=None, before_retry=None, retry_kinds=RETRYABLE):
+    policy = policy or RetryPolicy()
+    stats = _new_stats(stats)
+    for attempt in range(policy.max_attempts):
+        if breaker is not None:
+            stats["breaker_seconds"] += breaker.wait()
+        if attempt and before_retry:
+            before_retry()
+        stats["attempts"] += 1
+        try:
+            if policy.hedge_after:
+                return _call_hedged(call, policy.hedge_after, stats, before_retry)
+            return call()
+        except Exception as e:
+            _handle_failure(e, attempt, policy, breaker, stats, retry_kinds)
+
+
+# Function to stream a model response with the same retries, as long as no text has been yielded yet
+# (once chunks reach the caller a retry would repeat them, so later errors are raised as they are)
+def stream_with_retries(open_stream, policy=None, breaker=None, stats=None, before_retry=None,
+                        retry_kinds=RETRYABLE):
+    policy = policy or RetryPolicy()
+    stats = _new_stats(stats)
+    for attempt in range(policy.max_attempts):
+        if breaker is not None:
+            stats["breaker_seconds"] += breaker.wait()
+        if attempt and before_retry:
+            before_retry()
+        stats["attempts"] += 1
+        streamed = False
+        try:
+            for chunk in open_stream():
+                streamed = True
+                yield chunk
+            return
+        except Exception as e:
+            if streamed:
+                raise
+            _handle_failure(e, attempt, policy, breaker, stats, retry_kinds)
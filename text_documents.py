@@ -0,0 +1,108 @@
+# Long digital Hindi text
+# Text that is already digital never needs the vision model, and a long text should not wait on one
+# request either. Pasted text and .txt/.docx uploads are cut at Devanagari sentence boundaries (।, ॥, ?, !)
+# and line breaks into chunks of a bounded number of tokens. The chunks are converted in parallel like the
+# pages of a PDF (see convert_text_document) and joined back in order with the original line breaks.
+
+import os
+import re
+import zipfile
+from io import BytesIO
+from xml.etree import ElementTree
+
+TEXT_EXTENSIONS = (".txt", ".docx")
+
+# Small enough that a chunk's answer stays far below the model's output limit and many chunks run at once
+MAX_CHUNK_TOKENS = int(os.environ.get("HINGLISH_CHUNK_TOKENS", 1000))
+CHARS_PER_TOKEN = 3  # Devanagari takes more tokens per character than English
+
+# A boundary is the whitespace after sentence-ending punctuation, or a line break with the whitespace around it
+SENTENCE_BOUNDARY = re.compile(r"((?<=[।॥?!])[ \t]+|[ \t]*\n\s*)")
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+# Function to estimate the tokens of a piece of text
+def estimate_text_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+# Function to split text into (sentence, whitespace that followed it) pairs, joining them gives the text back
+def split_sentences(text):
+    pieces = SENTENCE_BOUNDARY.split(text.strip())
+    return [(pieces[index], pieces[index + 1] if index + 1 < len(pieces) else "")
+            for index in range(0, len(pieces), 2) if pieces[index]]
+
+
+# Function to split a sentence that is longer than a chunk on its own at word boundaries
+def _split_long_sentence(sentence, separator, max_tokens):
+    pieces, current = [], []
+    for word in sentence.split():
+        if current and estimate_text_tokens(" ".join(current + [word])) > max_tokens:
+            pieces.append((" ".join(current), " "))
+            current = []
+        current.append(word)
+    pieces.append((" ".join(current), separator))
+    return pieces
+
+
+# Function to cut text into chunks of at most `max_tokens` tokens, returns (chunk text, separator) pairs
+# Chunks end at sentence boundaries, the separator is the whitespace that followed the chunk
+def chunk_text(text, max_tokens=MAX_CHUNK_TOKENS):
+    chunks, current, current_tokens = [], [], 0
+    for sentence, separator in split_sentences(text):
+        units = [(sentence, separator)]
+        if estimate_text_tokens(sentence) > max_tokens:
+            units = _split_long_sentence(sentence, separator, max_tokens)
+        for unit, unit_separator in units:
+            tokens = estimate_text_tokens(unit)
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append(_close_chunk(current))
+                current, current_tokens = [], 0
+            current.append((unit, unit_separator))
+            current_tokens += tokens
+    if current:
+        chunks.append(_close_chunk(current))
+    return chunks
+
+
+def _close_chunk(units):
+    return "".join(unit + separator for unit, separator in units[:-1]) + units[-1][0], units[-1][1]
+
+
+# Function to join converted chunks in order, given as (text, separator) pairs; chunks without text are left out
+# Paragraph breaks and line breaks between chunks are kept, any other whitespace becomes a single space
+def join_chunks(pieces):
+    parts = []
+    for text, separator in pieces:
+        if not text:
+            continue
+        newlines = separator.count("\n")
+        parts.append(text.strip() + ("\n\n" if newlines > 1 else "\n" if newlines else " "))
+    return "".join(parts).strip()
+
+
+# Function to extract the text of a .docx file, one line per paragraph
+def docx_text(data):
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{WORD_NAMESPACE}p"):
+        pieces = []
+        for node in paragraph.iter():
+            if node.tag == f"{WORD_NAMESPACE}t":
+                pieces.append(node.text or "")
+            elif node.tag == f"{WORD_NAMESPACE}tab":
+                pieces.append("\t")
+            elif node.tag in (f"{WORD_NAMESPACE}br", f"{WORD_NAMESPACE}cr"):
+                pieces.append("\n")
+        paragraphs.append("".join(pieces))
+    return "\n".join(paragraphs)
+
+
+# Function to read an uploaded text document (.txt in UTF-8 or UTF-16, or .docx) into a string
+def read_text_file(name, data):
+    if (name or "").lower().endswith(".docx"):
+        return docx_text(data)
+    if data.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return data.decode("utf-16")
+    return data.decode("utf-8-sig", errors="replace")
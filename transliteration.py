@@ -0,0 +1,209 @@
+# Offline, rule-based Devanagari to Hinglish transliteration
+# Used for text that is already digital (PDF text layers, pasted text) and as a fallback
+# when the Gemini API is rate limited. No network calls, no model.
+
+import re
+from functools import lru_cache
+
+
+# Character classes stored in the lookup table
+CONSONANT = 1
+VOWEL = 2
+MATRA = 3
+HALANT = 4
+NUKTA = 5
+ANUSVARA = 6
+CHANDRABINDU = 7
+VISARGA = 8
+OTHER = 9
+
+# Romanization tables, Hinglish style ("kh", "sh", "aa", "ee") rather than scholarly IAST
+CONSONANTS = {
+    "क": "k", "ख": "kh", "ग": "g", "घ": "gh", "ङ": "n",
+    "च": "ch", "छ": "chh", "ज": "j", "झ": "jh", "ञ": "n",
+    "ट": "t", "ठ": "th", "ड": "d", "ढ": "dh", "ण": "n",
+    "त": "t", "थ": "th", "द": "d", "ध": "dh", "न": "n", "ऩ": "n",
+    "प": "p", "फ": "ph", "ब": "b", "भ": "bh", "म": "m",
+    "य": "y", "र": "r", "ऱ": "r", "ल": "l", "ळ": "l", "ऴ": "zh", "व": "v",
+    "श": "sh", "ष": "sh", "स": "s", "ह": "h",
+    # Precomposed nukta letters (U+0958 - U+095F)
+    "\u0958": "q", "\u0959": "kh", "\u095A": "gh", "\u095B": "z",
+    "\u095C": "d", "\u095D": "dh", "\u095E": "f", "\u095F": "y",
+}
+
+# What a consonant's romanization becomes when followed by the combining nukta (U+093C)
+NUKTA_FORMS = {"k": "q", "g": "gh", "j": "z", "ph": "f"}
+
+VOWELS = {
+    "अ": "a", "आ": "aa", "इ": "i", "ई": "ee", "उ": "u", "ऊ": "oo",
+    "ऋ": "ri", "ॠ": "ri", "ऌ": "li", "ॡ": "li",
+    "ए": "e", "ऐ": "ai", "ऍ": "e", "ऎ": "e", "ओ": "o", "औ": "au", "ऑ": "o", "ऒ": "o",
+}
+
+MATRAS = {
+    "ा": "aa", "ि": "i", "ी": "ee", "ु": "u", "ू": "oo", "ृ": "ri", "ॄ": "ri",
+    "े": "e", "ै": "ai", "ॅ": "e", "ॆ": "e", "ो": "o", "ौ": "au", "ॉ": "o", "ॊ": "o",
+}
+
+SIGNS = {
+    "्": (HALANT, ""),
+    "़": (NUKTA, ""),
+    "ं": (ANUSVARA, "n"),
+    "ँ": (CHANDRABINDU, "n"),
+    "ः": (VISARGA, "h"),
+    "ऽ": (OTHER, ""),
+    "ॐ": (OTHER, "om"),
+}
+
+# Punctuation and digits are swapped with str.translate outside of words
+PUNCTUATION = str.maketrans({"।": ".", "॥": ".", "॰": ".", **{chr(0x0966 + digit): str(digit) for digit in range(10)}})
+
+# Long vowels are written short at the end of a word (mera, nahi, tu, aai), except in one-letter words (aa)
+FINAL_SHORT_FORMS = {"aa": "a", "ee": "i", "oo": "u"}
+
+# Final schwa survives after a conjunct only when the last consonant is one of these (mitra, dhanya, shukla)
+SCHWA_KEEPING_FINALS = ("y", "r", "l", "v")
+
+# "i"/"ee" followed by a standalone vowel picks up a "y" glide (chahiye, liye)
+GLIDE_VOWELS = ("i", "ee")
+
+# Anusvara is pronounced "m" before labials (sambandh, champa), "n" everywhere else
+LABIALS = ("p", "b", "m")
+
+# Common words whose spelling the rules cannot get right (irregular schwa, conventional Hinglish spellings)
+EXCEPTIONS = {
+    "यह": "yeh", "वह": "woh", "ये": "ye", "वो": "wo", "वे": "ve",
+    "है": "hai", "हैं": "hain", "हूँ": "hoon", "हूं": "hoon", "हो": "ho",
+    "में": "mein", "मैं": "main", "नहीं": "nahi", "नही": "nahi",
+    "और": "aur", "क्या": "kya", "क्यों": "kyon", "कि": "ki", "की": "ki",
+    "ही": "hi", "भी": "bhi", "जी": "ji", "तो": "to", "माँ": "maa", "मां": "maa",
+    "हाँ": "haan", "हां": "haan", "अच्छा": "achha", "अच्छी": "achhi", "अच्छे": "achhe",
+    "भारत": "bharat", "हिंदी": "hindi", "हिन्दी": "hindi", "उदाहरण": "udaharan",
+    "नमस्ते": "namaste", "नमस्कार": "namaskar", "धन्यवाद": "dhanyavaad",
+    "सरकार": "sarkar", "समाचार": "samachar", "कृपया": "kripya",
+}
+
+
+# Function to build the code point lookup table once at import time
+def _build_lookup_table():
+    table = [None] * 0x80
+    for mapping, kind in ((CONSONANTS, CONSONANT), (VOWELS, VOWEL), (MATRAS, MATRA)):
+        for char, roman in mapping.items():
+            if len(char) == 1:
+                table[ord(char) - 0x0900] = (kind, roman)
+    for char, (kind, roman) in SIGNS.items():
+        table[ord(char) - 0x0900] = (kind, roman)
+    return tuple(table)
+
+
+LOOKUP_TABLE = _build_lookup_table()
+
+VOWEL_SOUNDS = frozenset(VOWELS.values()) | frozenset(MATRAS.values()) | {"a"}
+
+# Runs of Devanagari letters and signs (plus zero-width joiners that can sit inside words),
+# dandas and digits are left out so they never end up inside a word
+WORD_PATTERN = re.compile("[\u0900-\u0963\u0971-\u097F\u200C\u200D]+")
+SENTENCE_START_PATTERN = re.compile(r"(^|[.?!]\s+|\n\s*)([a-z])")
+
+
+# Function to split a word into syllable slots: [consonant, vowel, nasal] or a standalone sign
+def _parse_word(word):
+    syllables = []
+    for char in word:
+        code = ord(char) - 0x0900
+        entry = LOOKUP_TABLE[code] if 0 <= code < 0x80 else None
+        if entry is None:
+            continue  # ZWJ/ZWNJ and unassigned code points
+        kind, roman = entry
+
+        if kind == CONSONANT:
+            # Inherent schwa until a matra or halant says otherwise
+            syllables.append([roman, "a", "", True])
+        elif kind == VOWEL:
+            syllables.append(["", roman, "", False])
+        elif kind == MATRA and syllables and syllables[-1][0]:
+            syllables[-1][1] = roman
+            syllables[-1][3] = False
+        elif kind == HALANT and syllables and syllables[-1][0]:
+            syllables[-1][1] = ""
+            syllables[-1][3] = False
+        elif kind == NUKTA and syllables:
+            # Decomposed nukta letters (base consonant + U+093C)
+            syllables[-1][0] = NUKTA_FORMS.get(syllables[-1][0], syllables[-1][0])
+        elif kind in (ANUSVARA, CHANDRABINDU) and syllables:
+            syllables[-1][2] = "n"
+            syllables[-1][3] = False  # a nasalized vowel is never dropped
+        elif kind == VISARGA and syllables:
+            syllables[-1][2] = "h"
+        elif kind == OTHER or kind == MATRA:
+            syllables.append(["", roman, "", False])
+    return syllables
+
+
+# Function to apply Hindi schwa deletion to parsed syllables (in place)
+def _delete_schwas(syllables):
+    count = len(syllables)
+    if count < 2:
+        return
+
+    # Word-final schwa is silent (kam, naam, film) unless it closes a conjunct like mitra or dhanya
+    last = syllables[-1]
+    if last[3] and (syllables[-2][1] or last[0] not in SCHWA_KEEPING_FINALS):
+        last[1] = ""
+        last[3] = False
+
+    # Medial schwa is silent between an open syllable and a consonant+vowel (VC_CV): kamala -> kamla,
+    # but not after a nasal or visarga coda (zindagi)
+    index = count - 2
+    while index > 0:
+        current = syllables[index]
+        previous = syllables[index - 1]
+        following = syllables[index + 1]
+        if current[3] and previous[1] and not previous[2] and following[0] and following[1]:
+            current[1] = ""
+            current[3] = False
+            index -= 2  # never delete two schwas in a row
+        else:
+            index -= 1
+
+
+# Function to transliterate one Devanagari word (cached, running text repeats words a lot)
+@lru_cache(maxsize=65536)
+def transliterate_word(word):
+    exception = EXCEPTIONS.get(word)
+    if exception is not None:
+        return exception
+
+    syllables = _parse_word(word)
+    _delete_schwas(syllables)
+
+    vowel_count = sum(1 for syllable in syllables if syllable[1] in VOWEL_SOUNDS)
+    last_index = len(syllables) - 1
+    parts = []
+    for index, (consonant, vowel, nasal, _) in enumerate(syllables):
+        if vowel == "aa" and consonant and index != last_index and vowel_count > 2:
+            vowel = "a"  # long words read better with a single "a" (samachar, batana)
+        if index == last_index and (consonant or index > 0):
+            vowel = FINAL_SHORT_FORMS.get(vowel, vowel)  # standalone final vowels too (aai, bhaai)
+        if nasal == "n" and index < last_index and syllables[index + 1][0].startswith(LABIALS):
+            nasal = "m"
+        if not consonant and index > 0 and parts[-1].endswith(GLIDE_VOWELS):
+            consonant = "y"
+        parts.append(consonant + vowel + nasal)
+    return "".join(parts)
+
+
+def _replace_word(match):
+    return transliterate_word(match.group(0))
+
+
+def _capitalize(match):
+    return match.group(1) + match.group(2).upper()
+
+
+# Function to transliterate Hindi text to Hinglish, everything outside Devanagari is kept as is
+def transliterate(text, capitalize_sentences=True):
+    result = WORD_PATTERN.sub(_replace_word, text).translate(PUNCTUATION)
+    if capitalize_sentences:
+        result = SENTENCE_START_PATTERN.sub(_capitalize, result)
+    return result
@@ -0,0 +1,98 @@
+# Upload spooling
+# Small uploads stay in memory. Large ones are written to a temporary file once, in chunks, and opened from
+# there: PyMuPDF reads the pages it needs from disk, render worker processes open the same file instead of
+# receiving a pickled copy of the bytes, and the hash used for checkpoints is computed while writing.
+
+import hashlib
+import os
+import tempfile
+import time
+
+SPOOL_THRESHOLD_BYTES = int(os.environ.get("HINGLISH_SPOOL_THRESHOLD_MB", 16)) * 1024 * 1024
+SPOOL_DIR = os.environ.get("HINGLISH_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "hinglish_uploads"))
+SPOOL_TTL_SECONDS = 24 * 3600  # spooled files of sessions that never cleaned up are removed after a day
+CHUNK_BYTES = 1024 * 1024
+
+
+# Function to copy a file object to another in chunks, optionally hashing what passes through
+# Copies `length` bytes when given (e.g. an HTTP request body), otherwise everything. Returns the bytes copied.
+def copy_stream(source, target, length=None, digest=None):
+    copied = 0
+    while length is None or copied < length:
+        chunk = source.read(CHUNK_BYTES if length is None else min(CHUNK_BYTES, length - copied))
+        if not chunk:
+            break
+        target.write(chunk)
+        if digest is not None:
+            digest.update(chunk)
+        copied += len(chunk)
+    return copied
+
+
+# Function to delete spooled files older than the TTL
+def prune_spool(spool_dir=SPOOL_DIR, ttl_seconds=SPOOL_TTL_SECONDS):
+    expired = time.time() - ttl_seconds
+    for entry in os.scandir(spool_dir):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < expired:
+                os.remove(entry.path)
+        except OSError:
+            pass  # removed by another session in the meantime
+
+
+class SpooledUpload:
+    """An uploaded document: bytes in memory when small, a temporary file when large."""
+
+    def __init__(self, name, size, sha256, data=None, path=None, buffer_bytes=0):
+        self.name = name
+        self.size = size
+        self.sha256 = sha256
+        self.data = data
+        self.path = path
+        self.buffer_bytes = buffer_bytes  # held by the in-memory upload object itself, e.g. Streamlit's UploadedFile
+
+    # What open_pdf and the render workers open: the file path, or the bytes of a small upload
+    @property
+    def source(self):
+        return self.path or self.data
+
+    # Small uploads share the upload object's buffer (see spool_upload), so it is counted once
+    @property
+    def memory_bytes(self):
+        return max(self.buffer_bytes, len(self.data) if self.data is not None else 0)
+
+    def close(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+        self.data = self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Function to spool an uploaded file object (e.g. a Streamlit UploadedFile), returns a SpooledUpload
+# A Streamlit upload already sits in memory as a BytesIO. Spooling it cannot free that buffer, so it stays in
+# the memory report, but a small upload's bytes are taken with getvalue(), which shares the buffer instead of
+# copying it the way read() does.
+def spool_upload(upload, name=None, threshold=SPOOL_THRESHOLD_BYTES, spool_dir=SPOOL_DIR):
+    name = name or getattr(upload, "name", None)
+    upload.seek(0, os.SEEK_END)
+    size = upload.tell()
+    upload.seek(0)
+    in_memory = hasattr(upload, "getvalue")
+    buffer_bytes = size if in_memory else 0
+    if size < threshold:
+        data = upload.getvalue() if in_memory else upload.read()
+        return SpooledUpload(name, size, hashlib.sha256(data).hexdigest(), data=data, buffer_bytes=buffer_bytes)
+
+    os.makedirs(spool_dir, exist_ok=True)
+    prune_spool(spool_dir)
+    digest = hashlib.sha256()
+    handle, path = tempfile.mkstemp(suffix=os.path.splitext(name or "")[1], dir=spool_dir)
+    with os.fdopen(handle, "wb") as spooled:
+        copy_stream(upload, spooled, digest=digest)
+    upload.seek(0)
+    return SpooledUpload(name, size, digest.hexdigest(), path=path, buffer_bytes=buffer_bytes)